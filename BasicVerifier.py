@@ -1,8 +1,9 @@
 from fastapi_sessions.session_verifier import SessionVerifier
 from fastapi import HTTPException
+from datetime import datetime
 from uuid import UUID
 from schemas import SessionData
-from fastapi_sessions.backends.implementations import InMemoryBackend
+from fastapi_sessions.backends.session_backend import SessionBackend
 
 
 class BasicVerifier(SessionVerifier[UUID, SessionData]):
@@ -11,7 +12,7 @@ class BasicVerifier(SessionVerifier[UUID, SessionData]):
         *,
         identifier: str,
         auto_error: bool,
-        backend: InMemoryBackend[UUID, SessionData],
+        backend: SessionBackend[UUID, SessionData],
         auth_http_exception: HTTPException,
     ):
         self._identifier = identifier
@@ -36,5 +37,5 @@ class BasicVerifier(SessionVerifier[UUID, SessionData]):
         return self._auth_http_exception
 
     def verify_session(self, model: SessionData) -> bool:
-        """If the session exists, it is valid"""
-        return True
\ No newline at end of file
+        """If the session exists and has not expired, it is valid"""
+        return model.expires_at is not None and model.expires_at > datetime.now()
\ No newline at end of file
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import UUID
+from fastapi_sessions.backends.session_backend import SessionBackend
+from starlette.concurrency import run_in_threadpool
+from cache import TTLCache
+from schemas import SessionData
+import crud
+
+
+class DatabaseBackend(SessionBackend[UUID, SessionData]):
+    """Keeps sessions in the sessions table so every worker sees the same ones.
+
+    Reads go through a per-process TTL LRU cache, so repeat requests with the same cookie
+    do not touch the database. Writes go to the table first and then drop the local entry;
+    other workers see them once their entry expires (SESSION_CACHE_TTL, 5 seconds by default).
+    """
+
+    def __init__(self, session_factory, lifetime: timedelta, cache: TTLCache):
+        self.session_factory = session_factory
+        self.lifetime = lifetime
+        self.cache = cache
+
+    def _run(self, operation, *args):
+        db = self.session_factory()
+        try:
+            return operation(db, *args)
+        finally:
+            db.close()
+
+    def _load(self, db, session_id: UUID) -> Optional[SessionData]:
+        db_session = crud.check_session(db, session_id)
+        if db_session is None:
+            return None
+        return SessionData(
+            user_id=db_session.user_id,
+            user_role=db_session.user_role,
+            user_email=db_session.user_email,
+            expires_at=db_session.expires_at,
+        )
+
+    async def create(self, session_id: UUID, data: SessionData) -> None:
+        if data.expires_at is None:
+            data.expires_at = datetime.now() + self.lifetime
+        await run_in_threadpool(self._run, crud.create_session, session_id, data.user_id, data.expires_at)
+        self.cache.pop(session_id)
+
+    async def read(self, session_id: UUID) -> Optional[SessionData]:
+        found, data = self.cache.lookup(session_id)
+        if found:
+            return data
+        # Unknown IDs are not cached, so forged cookies cannot push real sessions out
+        return await run_in_threadpool(
+            self.cache.get_or_set, session_id, lambda: self._run(self._load, session_id), cache_none=False
+        )
+
+    async def update(self, session_id: UUID, data: SessionData) -> None:
+        await run_in_threadpool(self._run, crud.update_session, session_id, data)
+        self.cache.pop(session_id)
+
+    async def delete(self, session_id: UUID) -> None:
+        await run_in_threadpool(self._run, crud.delete_session, session_id)
+        self.cache.pop(session_id)
@@ -0,0 +1,159 @@
+# Async counterparts of the read-only crud functions behind the hot list, detail and
+# statistics endpoints. They take an AsyncSession and return exactly what their crud
+# namesakes return; writes stay on the sync path in crud.py.
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import func
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from typing import List
+import models
+from crud import (
+    PRODUCTION_TOTALS_COLUMNS,
+    PRODUCTION_TOTALS_GLOBAL_ID,
+    keyset_page,
+    keyset_queries,
+    normalize_user_id,
+    order_column,
+    production_totals_to_statistics,
+    shipment_detail_to_dict,
+    shipment_to_dict,
+)
+
+async def paginate(db: AsyncSession, stmt, id_column, time_column=None, after: str = None, limit: int = 100):
+    rows = []
+    for phase in keyset_queries(stmt, id_column, time_column, after):
+        rows += (await db.scalars(phase.limit(limit + 1 - len(rows)))).all()
+        if len(rows) > limit:
+            break
+    return keyset_page(rows, id_column, time_column, limit)
+
+# wet leaves
+async def get_wet_leaves(db: AsyncSession, limit: int = 100, after: str = None, order_by: str = "id", status: str = None):
+    time_column = order_column(order_by, models.WetLeaves.ReceivedTime)
+    stmt = select(models.WetLeaves)
+    if status is not None:
+        stmt = stmt.where(models.WetLeaves.Status == status)
+    return await paginate(db, stmt, models.WetLeaves.WetLeavesID, time_column, after, limit)
+
+async def get_wet_leaves_by_id(db: AsyncSession, wet_leaves_id: int):
+    return await db.get(models.WetLeaves, wet_leaves_id)
+
+async def get_wet_leaves_by_user_id(db: AsyncSession, user_id: str, status: str = None):
+    stmt = select(models.WetLeaves).where(models.WetLeaves.UserID == normalize_user_id(user_id))
+    if status is not None:
+        stmt = stmt.where(models.WetLeaves.Status == status)
+    return (await db.scalars(stmt)).all()
+
+async def sum_weight_wet_leaves_by_user_today(db: AsyncSession, user_id: str):
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    result = await db.scalar(select(func.sum(models.WetLeaves.Weight)).where(
+        and_(
+            models.WetLeaves.UserID == normalize_user_id(user_id),
+            models.WetLeaves.ReceivedTime >= today,
+            models.WetLeaves.ReceivedTime < today + timedelta(days=1)
+        )
+    ))
+    return result or 0
+
+# dry leaves
+async def get_dry_leaves(db: AsyncSession, limit: int = 100, after: str = None, order_by: str = "id", status: str = None):
+    time_column = order_column(order_by, models.DryLeaves.ProcessedTime)
+    stmt = select(models.DryLeaves)
+    if status is not None:
+        stmt = stmt.where(models.DryLeaves.Status == status)
+    return await paginate(db, stmt, models.DryLeaves.DryLeavesID, time_column, after, limit)
+
+async def get_dry_leaves_by_id(db: AsyncSession, dry_leaves_id: int):
+    return await db.get(models.DryLeaves, dry_leaves_id)
+
+async def get_dry_leaves_by_user_id(db: AsyncSession, user_id: str, status: str = None):
+    stmt = select(models.DryLeaves).where(models.DryLeaves.UserID == normalize_user_id(user_id))
+    if status is not None:
+        stmt = stmt.where(models.DryLeaves.Status == status)
+    return (await db.scalars(stmt)).all()
+
+# flour
+async def get_flour(db: AsyncSession, limit: int = 100, after: str = None, order_by: str = "id", status: str = None):
+    time_column = order_column(order_by, models.Flour.ProcessedTime)
+    stmt = select(models.Flour)
+    if status is not None:
+        stmt = stmt.where(models.Flour.Status == status)
+    return await paginate(db, stmt, models.Flour.FlourID, time_column, after, limit)
+
+async def get_flour_by_id(db: AsyncSession, flour_id: int):
+    return await db.get(models.Flour, flour_id)
+
+async def get_flour_by_user_id(db: AsyncSession, user_id: str, status: str = None):
+    stmt = select(models.Flour).where(models.Flour.UserID == normalize_user_id(user_id))
+    if status is not None:
+        stmt = stmt.where(models.Flour.Status == status)
+    return (await db.scalars(stmt)).all()
+
+# shipment
+async def get_shipment(db: AsyncSession, limit: int = 100, after: str = None, order_by: str = "id"):
+    time_column = order_column(order_by, models.Shipment.ShipmentDate)
+    # Lazy loads cannot run under asyncio, so the flours always come from one IN query
+    stmt = select(models.Shipment).options(selectinload(models.Shipment.flours))
+    shipments, next_cursor = await paginate(db, stmt, models.Shipment.ShipmentID, time_column, after, limit)
+    return [shipment_to_dict(shipment) for shipment in shipments], next_cursor
+
+async def get_shipment_by_id(db: AsyncSession, shipment_id: int):
+    row = (await db.execute(
+        select(models.Shipment, models.Courier.CourierName, models.User.Username)
+        .outerjoin(models.Courier, models.Courier.CourierID == models.Shipment.CourierID)
+        .outerjoin(models.User, models.User.UserID == models.Shipment.UserID)
+        .options(selectinload(models.Shipment.flours))
+        .where(models.Shipment.ShipmentID == shipment_id)
+    )).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Shipment not found")
+    return shipment_detail_to_dict(*row)
+
+async def get_shipment_by_user_id(db: AsyncSession, user_id: str):
+    shipments = (await db.scalars(
+        select(models.Shipment)
+        .options(selectinload(models.Shipment.flours))
+        .where(models.Shipment.UserID == normalize_user_id(user_id))
+    )).all()
+    return [shipment_to_dict(shipment) for shipment in shipments]
+
+# statistics
+async def sum_total_statistics(db: AsyncSession):
+    totals = (await db.execute(select(
+        func.coalesce(select(func.sum(models.WetLeaves.Weight)).scalar_subquery(), 0),
+        func.coalesce(select(func.sum(models.DryLeaves.Processed_Weight)).scalar_subquery(), 0),
+        func.coalesce(select(func.sum(models.Flour.Flour_Weight)).scalar_subquery(), 0),
+        func.coalesce(select(func.sum(models.Shipment.ShipmentQuantity)).scalar_subquery(), 0),
+    ))).one()
+    return {
+        "sum_wet_leaves": int(totals[0]),
+        "sum_dry_leaves": int(totals[1]),
+        "sum_flour": int(totals[2]),
+        "sum_shipment_quantity": int(totals[3]),
+    }
+
+async def sum_production_by_user(db: AsyncSession, user_ids: List[str] = None):
+    totals = {}
+    for column, (user_id_column, value_column) in PRODUCTION_TOTALS_COLUMNS.items():
+        stmt = select(user_id_column, func.sum(value_column)).group_by(user_id_column)
+        if user_ids is not None:
+            stmt = stmt.where(user_id_column.in_([normalize_user_id(user_id) for user_id in user_ids]))
+        for user_id, total in await db.execute(stmt):
+            if user_id is None:
+                continue
+            user_totals = totals.setdefault(user_id, dict.fromkeys(PRODUCTION_TOTALS_COLUMNS, 0))
+            user_totals[column] = total or 0
+    return totals
+
+async def get_production_totals(db: AsyncSession, user_id: str = None):
+    key = PRODUCTION_TOTALS_GLOBAL_ID if user_id is None else normalize_user_id(user_id)
+    row = await db.get(models.ProductionTotals, key)
+    if row:
+        return production_totals_to_statistics({column: getattr(row, column) for column in PRODUCTION_TOTALS_COLUMNS})
+
+    if user_id is None:
+        return await sum_total_statistics(db)
+    totals = (await sum_production_by_user(db, [key])).get(key, dict.fromkeys(PRODUCTION_TOTALS_COLUMNS, 0))
+    return production_totals_to_statistics(totals)
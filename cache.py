@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1], None
+            self.misses += 1
+            return False, None, self._generation
+
+    def _set(self, key, value, generation):
+        with self._lock:
+            # A clear() while loading means the value may predate the write that caused it
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+    def get_or_set(self, key, loader, cache_none: bool = True):
+        found, value, generation = self._get(key)
+        if not found:
+            value = loader()
+            if value is not None or cache_none:
+                self._set(key, value, generation)
+        return value
+
+    async def get_or_set_async(self, key, loader):
+        """get_or_set for a coroutine function `loader`."""
+        found, value, generation = self._get(key)
+        if not found:
+            value = await loader()
+            self._set(key, value, generation)
+        return value
+
+    def lookup(self, key):
+        """Return (True, value) for a live entry and (False, None) otherwise, without loading."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            return False, None
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+statistics_cache = TTLCache(
+    ttl=float(os.getenv("STATISTICS_CACHE_TTL", "30")),
+    maxsize=int(os.getenv("STATISTICS_CACHE_SIZE", "1024")),
+)
+
+# Bounds how long another worker may keep serving a session after it was logged out or
+# changed elsewhere, so it stays short; repeat requests within it still skip the database
+session_cache = TTLCache(
+    ttl=float(os.getenv("SESSION_CACHE_TTL", "5")),
+    maxsize=int(os.getenv("SESSION_CACHE_SIZE", "10000")),
+)
@@ -1,13 +1,20 @@
-from sqlalchemy import cast, Date, and_
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta    
+from sqlalchemy import cast, Date, and_, event, tuple_, update, select, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, selectinload
+from pydantic import ValidationError
+from datetime import datetime, timedelta, date
 from fastapi import HTTPException, Depends
 from sqlalchemy.sql import func
 from typing import List
 import models
 import schemas
 import uuid
+import base64
+import binascii
+import json
+from cache import statistics_cache
+from hashing import check_in_token
+from reference import reference_data
 
 #otp
 def create_otp(db: Session, otp: schemas.OTPCreate):
@@ -29,7 +36,7 @@ def delete_otp(db: Session, email: str):
     db.commit()
 
 #sessions
-def create_session(db: Session, session_id:str, user_id: str):
+def create_session(db: Session, session_id:str, user_id: str, expires_at: datetime = None):
     user = db.query(models.User).filter(models.User.UserID == user_id).first()
     
     if user is None:
@@ -38,19 +45,156 @@ def create_session(db: Session, session_id:str, user_id: str):
     user_role = user.RoleID
     user_email = user.Email
 
-    db_session = models.SessionData(session_id=session_id, user_id = user_id, user_role = user_role, user_email = user_email)
+    db_session = models.SessionData(session_id=str(session_id), user_id = user_id, user_role = user_role, user_email = user_email, expires_at = expires_at)
     db.add(db_session)
     db.commit()
 
 def check_session(db: Session, session_id: str):
-    db_session = db.query(models.SessionData).filter(session_id=session_id)
-    return db_session
+    return db.query(models.SessionData).filter(models.SessionData.session_id == str(session_id)).first()
 
-def delete_session(db: Session):
-    db.query(models.SessionData).delete()
+def update_session(db: Session, session_id: str, data: schemas.SessionData):
+    db.query(models.SessionData).filter(models.SessionData.session_id == str(session_id)).update(
+        {"user_role": data.user_role, "user_email": data.user_email, "expires_at": data.expires_at},
+        synchronize_session=False,
+    )
+    db.commit()
+
+def delete_session(db: Session, session_id: str):
+    db.query(models.SessionData).filter(models.SessionData.session_id == str(session_id)).delete(synchronize_session=False)
     db.commit()
 
+def delete_expired_sessions(db: Session, now: datetime = None, batch_size: int = 1000):
+    # Same batching as expire_stock: bounded DELETEs on the expires_at index, one transaction each
+    now = now or datetime.now()
+    deleted = 0
+    while True:
+        batch = (
+            select(models.SessionData.session_id)
+            .where(models.SessionData.expires_at <= now)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = db.execute(
+            delete(models.SessionData).where(models.SessionData.session_id.in_(batch)),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            break
+    return {"sessions": deleted}
+
+# pagination
+def encode_cursor(values) -> str:
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def paginate(query, id_column, time_column=None, after: str = None, limit: int = 100):
+    # Keyset pagination: each page starts strictly after the last key of the previous one,
+    # so deep pages cost the same as the first and concurrent inserts never shift rows
+    # between pages. Returns the page and an opaque cursor for the next one (None at the end).
+    rows = []
+    for phase in keyset_queries(query, id_column, time_column, after):
+        rows += phase.limit(limit + 1 - len(rows)).all()
+        if len(rows) > limit:
+            break
+    return keyset_page(rows, id_column, time_column, limit)
+
+def decode_keyset_cursor(after: str, id_column, time_column=None) -> list:
+    values = decode_cursor(after)
+    if len(values) != (1 if time_column is None else 2):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Exact type, so a string never reaches an integer key (and True never passes for 1)
+    if type(values[-1]) is not id_column.type.python_type:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if time_column is not None and values[0] is not None:
+        try:
+            values[0] = datetime.fromisoformat(values[0])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def keyset_queries(query, id_column, time_column=None, after: str = None):
+    # The ordered queries a page reads in turn until it is full. Ordered by time, rows with a
+    # timestamp come first in (time, id) order and rows without one (e.g. unsent shipments)
+    # follow in id order; a cursor with a null time resumes in that second part. Each part
+    # walks an index on its own, which a single NULLS LAST ordering could not do past the first
+    # page. Works on a Query or a select(), so async_crud pages the same way.
+    values = decode_keyset_cursor(after, id_column, time_column) if after is not None else None
+    if time_column is None:
+        if values is not None:
+            query = query.filter(id_column > values[0])
+        return [query.order_by(id_column)]
+
+    timed = query.filter(time_column.isnot(None)).order_by(time_column, id_column)
+    untimed = query.filter(time_column.is_(None)).order_by(id_column)
+    if values is None:
+        return [timed, untimed]
+    if values[0] is None:
+        return [untimed.filter(id_column > values[1])]
+    return [timed.filter(tuple_(time_column, id_column) > tuple_(*values)), untimed]
+
+def keyset_page(rows, id_column, time_column, limit: int):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    order = (id_column,) if time_column is None else (time_column, id_column)
+    return rows, encode_cursor([getattr(rows[-1], column.key) for column in order])
+
+def paginate_offset(query, id_column, skip: int = 0, limit: int = 10, after: str = None):
+    # Offset listings keep working for existing clients, but hand back a cursor so they can
+    # switch to keyset pagination from the next page on
+    if after is not None:
+        return paginate(query, id_column, after=after, limit=limit)
+    rows = query.order_by(id_column).offset(skip).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], id_column.key)])
+
+def paginate_rows(rows, id_key: str, skip: int = 0, limit: int = 10, after: str = None):
+    # paginate_offset for rows already held in memory and sorted by id_key
+    if after is not None:
+        values = decode_cursor(after)
+        if len(values) != 1:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        try:
+            rows = [row for row in rows if getattr(row, id_key) > values[0]]
+        except TypeError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        skip = 0
+    page = rows[skip:skip + limit + 1]
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    return page, encode_cursor([getattr(page[-1], id_key)])
+
+def order_column(order_by: str, time_column):
+    if order_by == "id":
+        return None
+    if order_by == "time":
+        return time_column
+    raise ValueError(f"Unsupported order_by: {order_by}")
+
 # users
+def normalize_user_id(user_id) -> str:
+    # UserIDs are stored as lowercase canonical UUID strings, so comparing the column
+    # directly against the normalised value keeps its index usable
+    try:
+        return str(uuid.UUID(str(user_id)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+
 def create_user(db: Session, user: schemas.UserCreate):
     user_uuid = str(uuid.uuid4())
     db_user = models.User(**user.dict(), UserID=user_uuid)
@@ -62,10 +206,10 @@ def create_user(db: Session, user: schemas.UserCreate):
 def get_user_by_role(db: Session, RoleID: int):
     return db.query(models.User).filter(models.User.RoleID == RoleID).all()
 
-def get_users(db: Session, skip: int = 0, limit: int = 10):
-    users = db.query(models.User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 10, after: str = None):
+    users, next_cursor = paginate_offset(db.query(models.User), models.User.UserID, skip, limit, after)
     print(f"Retrieved {len(users)} users from database")
-    return users
+    return users, next_cursor
 
 def get_user_count(db: Session):
     count = db.query(models.User).count()
@@ -73,7 +217,7 @@ def get_user_count(db: Session):
     return count
 
 def get_user_by_id(db: Session, user_id: str):
-    return db.query(models.User).filter(cast(models.User.UserID, UUID) == user_id).first()
+    return db.query(models.User).filter(models.User.UserID == normalize_user_id(user_id)).first()
 
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.Email == email).first()
@@ -100,17 +244,9 @@ def admin_update_user(db: Session, user_id: uuid.UUID, user_update: schemas.Admi
     if user_update.PhoneNumber is not None:
         user.PhoneNumber = user_update.PhoneNumber
     if user_update.RoleName is not None:
-       role_name_to_id = {
-        "Centra": 1,
-        "Harbor": 2,
-        "Company": 3,
-        "Admin": 4,
-        "Customer": 5,
-        "Rejected": 6
-    }
-    role = role_name_to_id.get(user_update.RoleName)
-    if role:
-        user.RoleID = role
+        role_id = reference_data.role_id_by_name(user_update.RoleName)
+        if role_id is not None:
+            user.RoleID = role_id
     db.commit()
     db.refresh(user)
     return user
@@ -141,10 +277,30 @@ def delete_user_by_id(db: Session, user_id: str):
         return True
     return False
 
+# reference data
+def bump_reference_version(db: Session):
+    # Committed with the caller's write; other workers see the new version on their next check
+    db.info["reference_data_changed"] = True
+    db.execute(
+        update(models.ReferenceDataVersion)
+        .where(models.ReferenceDataVersion.id == 1)
+        .values(version=models.ReferenceDataVersion.version + 1)
+    )
+
+@event.listens_for(Session, "after_commit")
+def invalidate_reference_data(session):
+    if session.info.pop("reference_data_changed", False):
+        reference_data.invalidate()
+
+@event.listens_for(Session, "after_rollback")
+def discard_reference_data_changes(session):
+    session.info.pop("reference_data_changed", None)
+
 # roles
 def create_role(db: Session, role: schemas.RoleCreate):
     db_role = models.RoleModel(**role.dict())
     db.add(db_role)
+    bump_reference_version(db)
     db.commit()
     db.refresh(db_role)
     return db_role
@@ -159,6 +315,7 @@ def delete_role_by_id(db: Session, role_id: str):
     db_user = db.query(models.RoleModel).filter(models.RoleModel.RoleID == role_id).first()
     if db_user:
         db.delete(db_user)
+        bump_reference_version(db)
         db.commit()
         return True
     return False
@@ -167,6 +324,7 @@ def delete_role_by_id(db: Session, role_id: str):
 def create_courier(db: Session, courier: schemas.CourierCreate):
     db_courier = models.Courier(**courier.dict())
     db.add(db_courier)
+    bump_reference_version(db)
     db.commit()
     db.refresh(db_courier)
     return db_courier
@@ -181,6 +339,7 @@ def delete_courier(db: Session, courier_id: int):
     courier_delete = db.query(models.Courier).filter(models.Courier.CourierID == courier_id).first()
     if courier_delete:
         db.delete(courier_delete)
+        bump_reference_version(db)
         db.commit()
         return True
     return False
@@ -189,52 +348,112 @@ def delete_courier(db: Session, courier_id: int):
 def create_wet_leaves(db: Session, wet_leaves: schemas.WetLeavesCreate):
     db_wet_leaves = models.WetLeaves(**wet_leaves.dict())
     db.add(db_wet_leaves)
+    add_production_totals(db, wet_leaves.UserID, WetLeavesWeight=wet_leaves.Weight)
+    add_production_daily(db, "wet_leaves", wet_leaves.UserID, wet_leaves.ReceivedTime, wet_leaves.Weight)
     db.commit()
     db.refresh(db_wet_leaves)
     return db_wet_leaves
     
-def get_wet_leaves(db: Session, limit: int = 100):
-    return db.query(models.WetLeaves).limit(limit).all()
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors())
+
+def bulk_create_wet_leaves(db: Session, records: List[dict], chunk_size: int = 1000):
+    # Validates the whole batch up front, then inserts the accepted rows with multi-row
+    # INSERTs of chunk_size rows each. Everything, including the production totals and the
+    # daily rollup, is committed in one transaction. Rows are numbered from 1.
+    errors = []
+    valid = []
+    for row, record in enumerate(records, start=1):
+        if isinstance(record, Exception):
+            errors.append({"row": row, "detail": str(record)})
+            continue
+        try:
+            valid.append((row, schemas.WetLeavesCreate(**record)))
+        except ValidationError as e:
+            errors.append({"row": row, "detail": format_validation_error(e)})
+        except TypeError:
+            errors.append({"row": row, "detail": "Expected an object"})
+
+    # One lookup for every user in the batch rather than a foreign key failure mid-insert
+    user_ids = {str(wet_leaves.UserID) for _, wet_leaves in valid}
+    known_users = set()
+    if user_ids:
+        known_users = {user_id for (user_id,) in db.query(models.User.UserID).filter(models.User.UserID.in_(user_ids))}
+
+    rows = []
+    totals = {}
+    daily = {}
+    for row, wet_leaves in valid:
+        user_id = str(wet_leaves.UserID)
+        if user_id not in known_users:
+            errors.append({"row": row, "detail": "User not found"})
+            continue
+        rows.append({
+            "UserID": user_id,
+            "Weight": wet_leaves.Weight,
+            "ReceivedTime": wet_leaves.ReceivedTime,
+            "Expiration": wet_leaves.Expiration,
+            "Status": wet_leaves.Status or "Awaiting",
+        })
+        totals[user_id] = totals.get(user_id, 0) + wet_leaves.Weight
+        day_key = (user_id, wet_leaves.ReceivedTime.date())
+        daily[day_key] = daily.get(day_key, 0) + wet_leaves.Weight
+
+    for start in range(0, len(rows), chunk_size):
+        db.execute(insert(models.WetLeaves), rows[start:start + chunk_size])
+    for user_id, weight in totals.items():
+        add_production_totals(db, user_id, WetLeavesWeight=weight)
+    for (user_id, day), weight in daily.items():
+        add_production_daily(db, "wet_leaves", user_id, day, weight)
+    db.commit()
+
+    errors.sort(key=lambda error: error["row"])
+    return {"accepted": len(rows), "rejected": len(errors), "errors": errors}
+
+def get_wet_leaves(db: Session, limit: int = 100, after: str = None, order_by: str = "id", status: str = None):
+    time_column = order_column(order_by, models.WetLeaves.ReceivedTime)
+    query = db.query(models.WetLeaves)
+    if status is not None:
+        query = query.filter(models.WetLeaves.Status == status)
+    return paginate(query, models.WetLeaves.WetLeavesID, time_column, after, limit)
 
 def get_wet_leaves_by_id(db: Session, wet_leaves_id: int):
     return db.query(models.WetLeaves).filter(models.WetLeaves.WetLeavesID == wet_leaves_id).first()
 
-def get_wet_leaves_by_user_id(db: Session, user_id: str):
-    return db.query(models.WetLeaves).filter(cast(models.WetLeaves.UserID, UUID) == user_id).all()
+def get_wet_leaves_by_user_id(db: Session, user_id: str, status: str = None):
+    query = db.query(models.WetLeaves).filter(models.WetLeaves.UserID == normalize_user_id(user_id))
+    if status is not None:
+        query = query.filter(models.WetLeaves.Status == status)
+    return query.all()
 
 
 def sum_weight_wet_leaves_by_user_today(db: Session, user_id: str):
-    today = datetime.now().date()
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
     result = db.query(func.sum(models.WetLeaves.Weight)).filter(
         and_(
-            cast(models.WetLeaves.UserID, UUID) == user_id,
-            cast(models.WetLeaves.ReceivedTime, Date) == today
+            models.WetLeaves.UserID == normalize_user_id(user_id),
+            models.WetLeaves.ReceivedTime >= today,
+            models.WetLeaves.ReceivedTime < today + timedelta(days=1)
         )
     ).scalar()
     return result or 0
 
 def sum_total_wet_leaves(db: Session):
-    wet_leaves_entries = db.query(models.WetLeaves).all()
-    sum_wet_leaves = int(sum(entry.Weight for entry in wet_leaves_entries))
-    return sum_wet_leaves
+    return int(db.query(func.coalesce(func.sum(models.WetLeaves.Weight), 0)).scalar())
 
 
 def sum_get_wet_leaves_by_user_id(db: Session, user_id: str):
-     # Assuming WetLeaves has a field 'value' that you want to sum up
-    wet_leaves_entries = db.query(models.WetLeaves).filter(cast(models.WetLeaves.UserID, UUID) == user_id).all()
-    
-    # Calculate the sum of the 'value' field from the retrieved entries
-    sum_wet_leaves = int(sum(entry.Weight for entry in wet_leaves_entries))
-    
-    return sum_wet_leaves
+    return int(db.query(func.coalesce(func.sum(models.WetLeaves.Weight), 0)).filter(models.WetLeaves.UserID == normalize_user_id(user_id)).scalar())
 
 def get_wet_leaves_by_user_and_id(db: Session, user_id: str, wet_leaves_id: int):
-    return db.query(models.WetLeaves).filter(cast(models.WetLeaves.UserID, UUID) == user_id, models.WetLeaves.WetLeavesID == wet_leaves_id).first()
+    return db.query(models.WetLeaves).filter(models.WetLeaves.UserID == normalize_user_id(user_id), models.WetLeaves.WetLeavesID == wet_leaves_id).first()
 
 def delete_wet_leaves_by_id(db: Session, wet_leaves_id: int):
     wet_leaves = db.query(models.WetLeaves).filter(models.WetLeaves.WetLeavesID == wet_leaves_id).first()
     if wet_leaves:
         db.delete(wet_leaves)
+        add_production_totals(db, wet_leaves.UserID, WetLeavesWeight=-(wet_leaves.Weight or 0))
+        add_production_daily(db, "wet_leaves", wet_leaves.UserID, wet_leaves.ReceivedTime, -(wet_leaves.Weight or 0))
         db.commit()
         return True
     return False
@@ -243,6 +462,8 @@ def update_wet_leaves(db: Session, wet_leaves_id: int, wet_leaves_update: schema
     db_wet_leaves = db.query(models.WetLeaves).filter(models.WetLeaves.WetLeavesID == wet_leaves_id).first()
     if not db_wet_leaves:
         return None
+    add_production_totals(db, db_wet_leaves.UserID, WetLeavesWeight=wet_leaves_update.Weight - (db_wet_leaves.Weight or 0))
+    add_production_daily(db, "wet_leaves", db_wet_leaves.UserID, db_wet_leaves.ReceivedTime, wet_leaves_update.Weight - (db_wet_leaves.Weight or 0))
     db_wet_leaves.Weight = wet_leaves_update.Weight
     if wet_leaves_update.Expiration is not None:
         db_wet_leaves.Expiration = wet_leaves_update.Expiration
@@ -259,6 +480,27 @@ def update_wet_leaves_status(db: Session, wet_leaves_id: int, status_update: sch
     db.refresh(db_wet_leaves)
     return db_wet_leaves
 
+def bulk_update_status(db: Session, model, id_column, ids: List[int], status: str):
+    # One UPDATE ... WHERE id IN (...) RETURNING, so the batch moves atomically and the
+    # changed rows come back without a second query. Statuses do not touch production totals.
+    ids = list(dict.fromkeys(ids))
+    updated = []
+    if ids:
+        stmt = update(model).where(id_column.in_(ids)).values(Status=status).returning(model)
+        updated = db.execute(stmt, execution_options={"synchronize_session": False}).scalars().all()
+        # Detach the returned rows so the commit does not expire them and force a reload
+        for row in updated:
+            db.expunge(row)
+    db.commit()
+    found = {getattr(row, id_column.key) for row in updated}
+    return {
+        "updated": sorted(updated, key=lambda row: getattr(row, id_column.key)),
+        "missing": [item_id for item_id in ids if item_id not in found],
+    }
+
+def bulk_update_wet_leaves_status(db: Session, status_update: schemas.BulkStatusUpdate):
+    return bulk_update_status(db, models.WetLeaves, models.WetLeaves.WetLeavesID, status_update.ids, status_update.Status)
+
 # dry leaves
 def create_dry_leaves(db: Session, dry_leaves: schemas.DryLeavesCreate):
     # Validate the wet leaves ID
@@ -268,41 +510,46 @@ def create_dry_leaves(db: Session, dry_leaves: schemas.DryLeavesCreate):
         raise HTTPException(status_code=404, detail="Wet leaves not found or do not belong to the user")
 
     db_dry_leaves = models.DryLeaves(**dry_leaves.dict())
+    if db_dry_leaves.ProcessedTime is None:
+        db_dry_leaves.ProcessedTime = datetime.now()
     db.add(db_dry_leaves)
+    add_production_totals(db, dry_leaves.UserID, DryLeavesWeight=dry_leaves.Processed_Weight)
+    add_production_daily(db, "dry_leaves", dry_leaves.UserID, db_dry_leaves.ProcessedTime, dry_leaves.Processed_Weight)
     db.commit()
     db.refresh(db_dry_leaves)
     return db_dry_leaves
 
-def get_dry_leaves(db: Session, limit: int = 100):
-    return db.query(models.DryLeaves).limit(limit).all()
+def get_dry_leaves(db: Session, limit: int = 100, after: str = None, order_by: str = "id", status: str = None):
+    time_column = order_column(order_by, models.DryLeaves.ProcessedTime)
+    query = db.query(models.DryLeaves)
+    if status is not None:
+        query = query.filter(models.DryLeaves.Status == status)
+    return paginate(query, models.DryLeaves.DryLeavesID, time_column, after, limit)
 
 def get_dry_leaves_by_id(db: Session, dry_leaves_id: int):
     return db.query(models.DryLeaves).filter(models.DryLeaves.DryLeavesID == dry_leaves_id).first()
 
-def get_dry_leaves_by_user_id(db: Session, user_id: str):
-    return db.query(models.DryLeaves).filter(cast(models.DryLeaves.UserID, UUID) == user_id).all()
+def get_dry_leaves_by_user_id(db: Session, user_id: str, status: str = None):
+    query = db.query(models.DryLeaves).filter(models.DryLeaves.UserID == normalize_user_id(user_id))
+    if status is not None:
+        query = query.filter(models.DryLeaves.Status == status)
+    return query.all()
 
 def get_dry_leaves_by_user_and_id(db: Session, user_id: str, dry_leaves_id: int):
-    return db.query(models.DryLeaves).filter(cast(models.DryLeaves.UserID, UUID) == user_id, models.DryLeaves.DryLeavesID == dry_leaves_id).first()
+    return db.query(models.DryLeaves).filter(models.DryLeaves.UserID == normalize_user_id(user_id), models.DryLeaves.DryLeavesID == dry_leaves_id).first()
 
 def sum_total_dry_leaves(db: Session):
-    dry_leaves_entries = db.query(models.DryLeaves).all()
-    sum_dry_leaves = int(sum(entry.Processed_Weight for entry in dry_leaves_entries))
-    return sum_dry_leaves
+    return int(db.query(func.coalesce(func.sum(models.DryLeaves.Processed_Weight), 0)).scalar())
 
 def sum_get_dry_leaves_by_user_id(db: Session, user_id: str):
-     # Assuming WetLeaves has a field 'value' that you want to sum up
-    dry_leaves_entries = db.query(models.DryLeaves).filter(cast(models.DryLeaves.UserID, UUID) == user_id).all()
-    
-    # Calculate the sum of the 'value' field from the retrieved entries
-    sum_dry_leaves = int(sum(entry.Processed_Weight for entry in dry_leaves_entries))
-    
-    return sum_dry_leaves
+    return int(db.query(func.coalesce(func.sum(models.DryLeaves.Processed_Weight), 0)).filter(models.DryLeaves.UserID == normalize_user_id(user_id)).scalar())
 
 def delete_dry_leaves_by_id(db: Session, dry_leaves_id: int):
     dry_leaves = db.query(models.DryLeaves).filter(models.DryLeaves.DryLeavesID == dry_leaves_id).first()
     if dry_leaves:
         db.delete(dry_leaves)
+        add_production_totals(db, dry_leaves.UserID, DryLeavesWeight=-(dry_leaves.Processed_Weight or 0))
+        add_production_daily(db, "dry_leaves", dry_leaves.UserID, dry_leaves.ProcessedTime, -(dry_leaves.Processed_Weight or 0))
         db.commit()
         return True
     return False
@@ -311,6 +558,8 @@ def update_dry_leaves(db: Session, dry_leaves_id: int, dry_leaves_update: schema
     db_dry_leaves = db.query(models.DryLeaves).filter(models.DryLeaves.DryLeavesID == dry_leaves_id).first()
     if not db_dry_leaves:
         return None
+    add_production_totals(db, db_dry_leaves.UserID, DryLeavesWeight=dry_leaves_update.Weight - (db_dry_leaves.Processed_Weight or 0))
+    add_production_daily(db, "dry_leaves", db_dry_leaves.UserID, db_dry_leaves.ProcessedTime, dry_leaves_update.Weight - (db_dry_leaves.Processed_Weight or 0))
     db_dry_leaves.Processed_Weight = dry_leaves_update.Weight
     if dry_leaves_update.Expiration is not None:
         db_dry_leaves.Expiration = dry_leaves_update.Expiration
@@ -327,6 +576,9 @@ def update_dry_leaves_status(db: Session, dry_leaves_id: int, status_update: sch
     db.refresh(db_dry_leaves)
     return db_dry_leaves
 
+def bulk_update_dry_leaves_status(db: Session, status_update: schemas.BulkStatusUpdate):
+    return bulk_update_status(db, models.DryLeaves, models.DryLeaves.DryLeavesID, status_update.ids, status_update.Status)
+
 # flour
 def create_flour(db: Session, flour: schemas.FlourCreate):
     # Validate the dry leaves ID
@@ -335,38 +587,43 @@ def create_flour(db: Session, flour: schemas.FlourCreate):
         raise HTTPException(status_code=404, detail="Dry leaves not found or do not belong to the user")
 
     db_flour = models.Flour(**flour.dict())
+    if db_flour.ProcessedTime is None:
+        db_flour.ProcessedTime = datetime.now()
     db.add(db_flour)
+    add_production_totals(db, flour.UserID, FlourWeight=flour.Flour_Weight)
+    add_production_daily(db, "flour", flour.UserID, db_flour.ProcessedTime, flour.Flour_Weight)
     db.commit()
     db.refresh(db_flour)
     return db_flour
     
-def get_flour(db: Session, limit: int = 100):
-    return db.query(models.Flour).limit(limit).all()
+def get_flour(db: Session, limit: int = 100, after: str = None, order_by: str = "id", status: str = None):
+    time_column = order_column(order_by, models.Flour.ProcessedTime)
+    query = db.query(models.Flour)
+    if status is not None:
+        query = query.filter(models.Flour.Status == status)
+    return paginate(query, models.Flour.FlourID, time_column, after, limit)
 
 def get_flour_by_id(db: Session, flour_id: int):
     return db.query(models.Flour).filter(models.Flour.FlourID == flour_id).first()
 
-def get_flour_by_user_id(db: Session, user_id: str):
-    return db.query(models.Flour).filter(models.Flour.UserID == user_id).all()
+def get_flour_by_user_id(db: Session, user_id: str, status: str = None):
+    query = db.query(models.Flour).filter(models.Flour.UserID == normalize_user_id(user_id))
+    if status is not None:
+        query = query.filter(models.Flour.Status == status)
+    return query.all()
 
 def sum_total_flour(db: Session):
-    flour_entries = db.query(models.Flour).all()
-    sum_flour = int(sum(entry.Flour_Weight for entry in flour_entries))
-    return sum_flour
+    return int(db.query(func.coalesce(func.sum(models.Flour.Flour_Weight), 0)).scalar())
 
 def sum_get_flour_by_user_id(db: Session, user_id: str):
-     # Assuming WetLeaves has a field 'value' that you want to sum up
-    flour_entries = db.query(models.Flour).filter(cast(models.Flour.UserID, UUID) == user_id).all()
-    
-    # Calculate the sum of the 'value' field from the retrieved entries
-    sum_flour = int(sum(entry.Flour_Weight for entry in flour_entries))
-    
-    return sum_flour
+    return int(db.query(func.coalesce(func.sum(models.Flour.Flour_Weight), 0)).filter(models.Flour.UserID == normalize_user_id(user_id)).scalar())
 
 def delete_flour_by_id(db: Session, flour_id: int):
     flour = db.query(models.Flour).filter(models.Flour.FlourID == flour_id).first()
     if flour:
         db.delete(flour)
+        add_production_totals(db, flour.UserID, FlourWeight=-(flour.Flour_Weight or 0))
+        add_production_daily(db, "flour", flour.UserID, flour.ProcessedTime, -(flour.Flour_Weight or 0))
         db.commit()
         return True
     return False
@@ -375,6 +632,8 @@ def update_flour(db: Session, flour_id: int, flour_update: schemas.FlourUpdate):
     db_flour = db.query(models.Flour).filter(models.Flour.FlourID == flour_id).first()
     if not db_flour:
         return None
+    add_production_totals(db, db_flour.UserID, FlourWeight=flour_update.Weight - (db_flour.Flour_Weight or 0))
+    add_production_daily(db, "flour", db_flour.UserID, db_flour.ProcessedTime, flour_update.Weight - (db_flour.Flour_Weight or 0))
     db_flour.Flour_Weight = flour_update.Weight
     if flour_update.Expiration is not None:
         db_flour.Expiration = flour_update.Expiration
@@ -391,6 +650,9 @@ def update_flour_status(db: Session, flour_id: int, status_update: schemas.Flour
     db.refresh(db_flour)
     return db_flour
 
+def bulk_update_flour_status(db: Session, status_update: schemas.BulkStatusUpdate):
+    return bulk_update_status(db, models.Flour, models.Flour.FlourID, status_update.ids, status_update.Status)
+
 # shipment
 def create_shipment(db: Session, shipment: schemas.ShipmentCreate):
     db_shipment = models.Shipment(
@@ -406,19 +668,18 @@ def create_shipment(db: Session, shipment: schemas.ShipmentCreate):
         # Centra_Reception_File=shipment.Centra_Reception_File,
     )
     db.add(db_shipment)
+    add_production_totals(db, shipment.UserID, ShipmentQuantity=shipment.ShipmentQuantity)
+    # Flush for the ShipmentID, then attach the flours and issue the check-in code in the same transaction
+    db.flush()
+    set_shipment_flours(db, db_shipment, shipment.FlourIDs, replace=False)
+    db_shipment.CheckInToken = check_in_token()
     db.commit()
     db.refresh(db_shipment)
 
-    for flour_id in shipment.FlourIDs:
-        flour = db.query(models.Flour).filter(models.Flour.FlourID == flour_id).first()
-        if flour:
-            db_shipment.flours.append(flour)
-    db.commit()
-    db.refresh(db_shipment)
-
-    # Include FlourIDs in the response
-    shipment_data = schemas.Shipment(
+    # Include FlourIDs and the check-in code in the response
+    shipment_data = schemas.ShipmentCreated(
         ShipmentID=db_shipment.ShipmentID,
+        CheckInToken=db_shipment.CheckInToken,
         CourierID=db_shipment.CourierID,
         UserID=db_shipment.UserID,
         FlourIDs=[flour.FlourID for flour in db_shipment.flours],
@@ -434,90 +695,135 @@ def create_shipment(db: Session, shipment: schemas.ShipmentCreate):
 
     return shipment_data
 
-def get_shipment(db: Session, limit: int = 100):
-    shipments = db.query(models.Shipment).limit(limit).all()
-    shipment_data = []
-    for shipment in shipments:
-        shipment_dict = {
-            "ShipmentID": shipment.ShipmentID,
-            "CourierID": shipment.CourierID,
-            "UserID": shipment.UserID,
-            "FlourIDs": [flour.FlourID for flour in shipment.flours],  # Ensure FlourIDs are included
-            "ShipmentQuantity": shipment.ShipmentQuantity,
-            "ShipmentDate": shipment.ShipmentDate,
-            "Check_in_Date": shipment.Check_in_Date,
-            "Check_in_Quantity": shipment.Check_in_Quantity,
-            "Rescalled_Weight" : shipment.Rescalled_Weight,
-            "Rescalled_Date" : shipment.Rescalled_Date,
-            "Harbor_Reception_File": shipment.Harbor_Reception_File,
-            "Centra_Reception_File": shipment.Centra_Reception_File,
+def set_shipment_flours(db: Session, db_shipment: models.Shipment, flour_ids: List[int], replace: bool = True):
+    # Replaces the shipment's flours with one IN query and one bulk insert, however many
+    # batches are attached. Unknown IDs are skipped, as before, and duplicates collapse.
+    requested = list(dict.fromkeys(flour_ids))
+    existing = set()
+    if requested:
+        existing = {
+            flour_id for (flour_id,) in
+            db.query(models.Flour.FlourID).filter(models.Flour.FlourID.in_(requested))
         }
-        shipment_data.append(shipment_dict)
-    return shipment_data
-
-def get_shipment_by_id(db: Session, shipment_id: int):
-    shipment = db.query(models.Shipment).filter(models.Shipment.ShipmentID == shipment_id).first()
-    if not shipment:
-        raise HTTPException(status_code=404, detail="Shipment not found")
-    
-    flour_weight_sum = sum(flour.Flour_Weight for flour in shipment.flours)
-    courier = db.query(models.Courier).filter(models.Courier.CourierID == shipment.CourierID).first()
-    user = db.query(models.User).filter(models.User.UserID == shipment.UserID).first()
-    
+    association = models.shipment_flour_association
+    if replace:
+        db.execute(association.delete().where(association.c.shipment_id == db_shipment.ShipmentID))
+    rows = [{"shipment_id": db_shipment.ShipmentID, "flour_id": flour_id} for flour_id in requested if flour_id in existing]
+    if rows:
+        db.execute(association.insert(), rows)
+    db.expire(db_shipment, ["flours"])
+
+def get_shipment(db: Session, limit: int = 100, after: str = None, order_by: str = "id"):
+    time_column = order_column(order_by, models.Shipment.ShipmentDate)
+    # selectinload fetches the flours of the whole page in one IN query instead of one per shipment
+    query = db.query(models.Shipment).options(selectinload(models.Shipment.flours))
+    shipments, next_cursor = paginate(query, models.Shipment.ShipmentID, time_column, after, limit)
+    return [shipment_to_dict(shipment) for shipment in shipments], next_cursor
+
+def shipment_to_dict(shipment):
+    # Needs shipment.flours loaded
     return {
         "ShipmentID": shipment.ShipmentID,
         "CourierID": shipment.CourierID,
         "UserID": shipment.UserID,
-        "FlourIDs": [flour.FlourID for flour in shipment.flours],
+        "FlourIDs": [flour.FlourID for flour in shipment.flours],  # Ensure FlourIDs are included
         "ShipmentQuantity": shipment.ShipmentQuantity,
         "ShipmentDate": shipment.ShipmentDate,
         "Check_in_Date": shipment.Check_in_Date,
         "Check_in_Quantity": shipment.Check_in_Quantity,
-        "Rescalled_Weight": shipment.Rescalled_Weight,
-        "Rescalled_Date": shipment.Rescalled_Date,
+        "Rescalled_Weight" : shipment.Rescalled_Weight,
+        "Rescalled_Date" : shipment.Rescalled_Date,
         "Harbor_Reception_File": shipment.Harbor_Reception_File,
         "Centra_Reception_File": shipment.Centra_Reception_File,
-        "FlourWeightSum": flour_weight_sum,
-        "CourierName": courier.CourierName if courier else None,
-        "UserName": user.Username if user else None
     }
 
+def shipment_detail_to_dict(shipment, courier_name, username):
+    return {
+        **shipment_to_dict(shipment),
+        "FlourWeightSum": sum(flour.Flour_Weight for flour in shipment.flours),
+        "CourierName": courier_name,
+        "UserName": username
+    }
+
+def get_shipment_by_id(db: Session, shipment_id: int):
+    # Courier and user names come from the same row via outer joins, flours from one IN query
+    row = (
+        db.query(models.Shipment, models.Courier.CourierName, models.User.Username)
+        .outerjoin(models.Courier, models.Courier.CourierID == models.Shipment.CourierID)
+        .outerjoin(models.User, models.User.UserID == models.Shipment.UserID)
+        .options(selectinload(models.Shipment.flours))
+        .filter(models.Shipment.ShipmentID == shipment_id)
+        .first()
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail="Shipment not found")
+    return shipment_detail_to_dict(*row)
+
+def column_dict(obj):
+    return {column.key: getattr(obj, column.key) for column in obj.__mapper__.column_attrs}
+
+def get_shipment_lineage(db: Session, shipment_ids: List[int]):
+    # Each flour has one dry leaves batch and each of those one wet leaves batch, so a single
+    # outer-joined query returns one row per (shipment, flour) with the whole chain attached
+    association = models.shipment_flour_association
+    rows = (
+        db.query(models.Shipment, models.Flour, models.DryLeaves, models.WetLeaves)
+        .outerjoin(association, association.c.shipment_id == models.Shipment.ShipmentID)
+        .outerjoin(models.Flour, models.Flour.FlourID == association.c.flour_id)
+        .outerjoin(models.DryLeaves, models.DryLeaves.DryLeavesID == models.Flour.DryLeavesID)
+        .outerjoin(models.WetLeaves, models.WetLeaves.WetLeavesID == models.DryLeaves.WetLeavesID)
+        .filter(models.Shipment.ShipmentID.in_(shipment_ids))
+        .order_by(models.Shipment.ShipmentID, models.Flour.FlourID)
+        .all()
+    )
+
+    lineage = {}
+    for shipment, flour, dry_leaves, wet_leaves in rows:
+        if shipment.ShipmentID not in lineage:
+            lineage[shipment.ShipmentID] = {**column_dict(shipment), "FlourIDs": [], "Flours": []}
+        if flour is None:
+            continue
+        dry_leaves_data = None
+        if dry_leaves is not None:
+            dry_leaves_data = {**column_dict(dry_leaves), "Source": column_dict(wet_leaves) if wet_leaves is not None else None}
+        lineage[shipment.ShipmentID]["FlourIDs"].append(flour.FlourID)
+        lineage[shipment.ShipmentID]["Flours"].append({**column_dict(flour), "Source": dry_leaves_data})
+
+    # Keep the order the IDs were asked for; unknown IDs are left out
+    return [lineage[shipment_id] for shipment_id in dict.fromkeys(shipment_ids) if shipment_id in lineage]
+
 def get_all_shipment_ids(db: Session):
     return db.query(models.Shipment).all()
 
 def get_shipment_by_user_id(db: Session, user_id: str):
-    shipments = db.query(models.Shipment).filter(models.Shipment.UserID == user_id).all()
-    shipment_data = []
-    for shipment in shipments:
-        shipment_dict = {
-            "ShipmentID": shipment.ShipmentID,
-            "CourierID": shipment.CourierID,
-            "UserID": shipment.UserID,
-            "FlourIDs": [flour.FlourID for flour in shipment.flours],
-            "ShipmentQuantity": shipment.ShipmentQuantity,
-            "ShipmentDate": shipment.ShipmentDate,
-            "Check_in_Date": shipment.Check_in_Date,
-            "Check_in_Quantity": shipment.Check_in_Quantity,
-            "Rescalled_Weight" : shipment.Rescalled_Weight,
-            "Rescalled_Date" : shipment.Rescalled_Date
-            
-        }
-        shipment_data.append(shipment_dict)
-    return shipment_data
+    shipments = (
+        db.query(models.Shipment)
+        .options(selectinload(models.Shipment.flours))
+        .filter(models.Shipment.UserID == normalize_user_id(user_id))
+        .all()
+    )
+    return [shipment_to_dict(shipment) for shipment in shipments]
 
 def sum_total_shipment_quantity(db: Session):
-    shipment_quantity_entries = db.query(models.Shipment).all()
-    sum_shipment_quantity = int(sum(entry.ShipmentQuantity for entry in shipment_quantity_entries))
-    return sum_shipment_quantity
+    return int(db.query(func.coalesce(func.sum(models.Shipment.ShipmentQuantity), 0)).scalar())
+
+def sum_total_statistics(db: Session):
+    # One round-trip: each total is a scalar subquery, so no rows are loaded
+    totals = db.query(
+        func.coalesce(db.query(func.sum(models.WetLeaves.Weight)).scalar_subquery(), 0),
+        func.coalesce(db.query(func.sum(models.DryLeaves.Processed_Weight)).scalar_subquery(), 0),
+        func.coalesce(db.query(func.sum(models.Flour.Flour_Weight)).scalar_subquery(), 0),
+        func.coalesce(db.query(func.sum(models.Shipment.ShipmentQuantity)).scalar_subquery(), 0),
+    ).one()
+    return {
+        "sum_wet_leaves": int(totals[0]),
+        "sum_dry_leaves": int(totals[1]),
+        "sum_flour": int(totals[2]),
+        "sum_shipment_quantity": int(totals[3]),
+    }
 
 def sum_get_shipment_quantity_by_user_id(db: Session, user_id: str):
-     # Assuming WetLeaves has a field 'value' that you want to sum up
-    shipment_quantity_entries = db.query(models.Shipment).filter(cast(models.Shipment.UserID, UUID) == user_id).all()
-    
-    # Calculate the sum of the 'value' field from the retrieved entries
-    sum_shipment_quantity = int(sum(entry.ShipmentQuantity for entry in shipment_quantity_entries))
-    
-    return sum_shipment_quantity
+    return int(db.query(func.coalesce(func.sum(models.Shipment.ShipmentQuantity), 0)).filter(models.Shipment.UserID == normalize_user_id(user_id)).scalar())
 
 def get_shipment_ids_with_date_but_no_checkin(db: Session) -> List[str]:
     shipments = db.query(models.Shipment.ShipmentID).filter(
@@ -526,6 +832,32 @@ def get_shipment_ids_with_date_but_no_checkin(db: Session) -> List[str]:
     ).all()
     return [shipment[0] for shipment in shipments]  # Extracting the IDs from the tuples
 
+def get_shipment_ids_by_check_in_token(db: Session, token: str) -> List[int]:
+    # A single lookup on the unique CheckInToken index, limited to shipments awaiting check-in
+    shipments = db.query(models.Shipment.ShipmentID).filter(
+        models.Shipment.CheckInToken == token,
+        models.Shipment.ShipmentDate.isnot(None),
+        models.Shipment.Check_in_Date.is_(None)
+    ).all()
+    return [shipment[0] for shipment in shipments]
+
+def issue_check_in_tokens(db: Session, batch_size: int = 1000) -> int:
+    # Backfills codes for shipments created before tokens existed
+    issued = 0
+    while True:
+        shipment_ids = [
+            shipment_id for (shipment_id,) in
+            db.query(models.Shipment.ShipmentID).filter(models.Shipment.CheckInToken.is_(None)).limit(batch_size)
+        ]
+        if not shipment_ids:
+            return issued
+        db.execute(
+            update(models.Shipment),
+            [{"ShipmentID": shipment_id, "CheckInToken": check_in_token()} for shipment_id in shipment_ids],
+        )
+        db.commit()
+        issued += len(shipment_ids)
+
 def get_shipment_flour_associations(db: Session):
     return db.query(models.shipment_flour_association).all()
 
@@ -537,6 +869,8 @@ def delete_shipment_by_id(db: Session, shipment_id: int):
     shipment = db.query(models.Shipment).filter(models.Shipment.ShipmentID == shipment_id).first()
     if shipment:
         db.delete(shipment)
+        add_production_totals(db, shipment.UserID, ShipmentQuantity=-(shipment.ShipmentQuantity or 0))
+        add_production_daily(db, "shipment", shipment.UserID, shipment.ShipmentDate, -(shipment.ShipmentQuantity or 0))
         db.commit()
         return True
     return False
@@ -550,12 +884,10 @@ def update_shipment(db: Session, shipment_id: int, shipment_update: schemas.Ship
     if shipment_update.CourierID is not None:
         db_shipment.CourierID = shipment_update.CourierID
     if shipment_update.FlourIDs is not None:
-        db_shipment.flours = []
-        for flour_id in shipment_update.FlourIDs:
-            flour = db.query(models.Flour).filter(models.Flour.FlourID == flour_id).first()
-            if flour:
-                db_shipment.flours.append(flour)
+        set_shipment_flours(db, db_shipment, shipment_update.FlourIDs)
     if shipment_update.ShipmentQuantity is not None:
+        add_production_totals(db, db_shipment.UserID, ShipmentQuantity=shipment_update.ShipmentQuantity - (db_shipment.ShipmentQuantity or 0))
+        add_production_daily(db, "shipment", db_shipment.UserID, db_shipment.ShipmentDate, shipment_update.ShipmentQuantity - (db_shipment.ShipmentQuantity or 0))
         db_shipment.ShipmentQuantity = shipment_update.ShipmentQuantity
     if shipment_update.Check_in_Quantity is not None:
         db_shipment.Check_in_Quantity = shipment_update.Check_in_Quantity
@@ -568,12 +900,29 @@ def update_shipment(db: Session, shipment_id: int, shipment_update: schemas.Ship
 
     db.commit()
     db.refresh(db_shipment)
-    return db_shipment
+
+    return schemas.Shipment(
+        ShipmentID=db_shipment.ShipmentID,
+        CourierID=db_shipment.CourierID,
+        UserID=db_shipment.UserID,
+        FlourIDs=[flour.FlourID for flour in db_shipment.flours],
+        ShipmentQuantity=db_shipment.ShipmentQuantity,
+        ShipmentDate=db_shipment.ShipmentDate,
+        Check_in_Date=db_shipment.Check_in_Date,
+        Check_in_Quantity=db_shipment.Check_in_Quantity,
+        Harbor_Reception_File=db_shipment.Harbor_Reception_File,
+        Rescalled_Weight=db_shipment.Rescalled_Weight,
+        Rescalled_Date=db_shipment.Rescalled_Date,
+        Centra_Reception_File=db_shipment.Centra_Reception_File,
+    )
 
 def update_shipment_date(db: Session, shipment_id: int, shipment_date_update: schemas.ShipmentDateUpdate):
     db_shipment = db.query(models.Shipment).filter(models.Shipment.ShipmentID == shipment_id).first()
     if not db_shipment:
         return None
+    # Shipments count towards the day they were sent, so a new date moves the quantity
+    add_production_daily(db, "shipment", db_shipment.UserID, db_shipment.ShipmentDate, -(db_shipment.ShipmentQuantity or 0))
+    add_production_daily(db, "shipment", db_shipment.UserID, shipment_date_update.ShipmentDate, db_shipment.ShipmentQuantity)
     db_shipment.ShipmentDate = shipment_date_update.ShipmentDate
     db.commit()
     db.refresh(db_shipment)
@@ -683,6 +1032,187 @@ def update_shipment_centra_reception(db: Session, shipment_id: int, update_data:
     )
     return shipment_data
 
+# production totals
+PRODUCTION_TOTALS_GLOBAL_ID = "global"
+
+PRODUCTION_TOTALS_COLUMNS = {
+    "WetLeavesWeight": (models.WetLeaves.UserID, models.WetLeaves.Weight),
+    "DryLeavesWeight": (models.DryLeaves.UserID, models.DryLeaves.Processed_Weight),
+    "FlourWeight": (models.Flour.UserID, models.Flour.Flour_Weight),
+    "ShipmentQuantity": (models.Shipment.UserID, models.Shipment.ShipmentQuantity),
+}
+
+@event.listens_for(Session, "after_commit")
+def invalidate_statistics_cache(session):
+    if session.info.pop("statistics_changed", False):
+        statistics_cache.clear()
+
+@event.listens_for(Session, "after_rollback")
+def discard_statistics_changes(session):
+    session.info.pop("statistics_changed", None)
+
+def add_production_totals(db: Session, user_id: str, **deltas):
+    # Upserts the centra row and the global row; the caller commits them together with its own write
+    deltas = {column: value for column, value in deltas.items() if value}
+    if not deltas:
+        return
+    db.info["statistics_changed"] = True
+    for key in (str(user_id), PRODUCTION_TOTALS_GLOBAL_ID):
+        stmt = insert(models.ProductionTotals).values(UserID=key, **deltas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[models.ProductionTotals.UserID],
+            set_={column: getattr(models.ProductionTotals, column) + value for column, value in deltas.items()},
+        )
+        db.execute(stmt)
+
+def sum_production_by_user(db: Session, user_ids: List[str] = None):
+    totals = {}
+    for column, (user_id_column, value_column) in PRODUCTION_TOTALS_COLUMNS.items():
+        query = db.query(user_id_column, func.sum(value_column)).group_by(user_id_column)
+        if user_ids is not None:
+            query = query.filter(user_id_column.in_([normalize_user_id(user_id) for user_id in user_ids]))
+        for user_id, total in query:
+            if user_id is None:
+                continue
+            user_totals = totals.setdefault(user_id, dict.fromkeys(PRODUCTION_TOTALS_COLUMNS, 0))
+            user_totals[column] = total or 0
+    return totals
+
+def production_totals_to_statistics(totals):
+    return {
+        "sum_wet_leaves": int(totals["WetLeavesWeight"]),
+        "sum_dry_leaves": int(totals["DryLeavesWeight"]),
+        "sum_flour": int(totals["FlourWeight"]),
+        "sum_shipment_quantity": int(totals["ShipmentQuantity"]),
+    }
+
+def get_production_totals(db: Session, user_id: str = None):
+    key = PRODUCTION_TOTALS_GLOBAL_ID if user_id is None else normalize_user_id(user_id)
+    row = db.query(models.ProductionTotals).filter(models.ProductionTotals.UserID == key).first()
+    if row:
+        return production_totals_to_statistics({column: getattr(row, column) for column in PRODUCTION_TOTALS_COLUMNS})
+
+    # No counters yet (fresh table or centra without production): aggregate from the source tables
+    if user_id is None:
+        return sum_total_statistics(db)
+    totals = sum_production_by_user(db, [key]).get(key, dict.fromkeys(PRODUCTION_TOTALS_COLUMNS, 0))
+    return production_totals_to_statistics(totals)
+
+def get_centra_statistics(db: Session, user_ids: List[str] = None):
+    totals = sum_production_by_user(db, user_ids)
+    if user_ids is None:
+        # Centra without any production still get a row of zeros
+        user_ids = [user_id for (user_id,) in db.query(models.User.UserID).filter(models.User.RoleID == reference_data.role_id_by_name("Centra"))]
+    for user_id in user_ids:
+        totals.setdefault(normalize_user_id(user_id), dict.fromkeys(PRODUCTION_TOTALS_COLUMNS, 0))
+    return {user_id: production_totals_to_statistics(user_totals) for user_id, user_totals in totals.items()}
+
+def rebuild_production_totals(db: Session):
+    totals = sum_production_by_user(db)
+    global_totals = dict.fromkeys(PRODUCTION_TOTALS_COLUMNS, 0)
+    for user_totals in totals.values():
+        for column, value in user_totals.items():
+            global_totals[column] += value
+
+    db.query(models.ProductionTotals).delete()
+    db.info["statistics_changed"] = True
+    db.add_all(models.ProductionTotals(UserID=user_id, **user_totals) for user_id, user_totals in totals.items())
+    db.add(models.ProductionTotals(UserID=PRODUCTION_TOTALS_GLOBAL_ID, **global_totals))
+    db.commit()
+    return len(totals)
+
+# production daily rollup
+PRODUCTION_STAGES = {
+    "wet_leaves": (models.WetLeaves.UserID, models.WetLeaves.ReceivedTime, models.WetLeaves.Weight),
+    "dry_leaves": (models.DryLeaves.UserID, models.DryLeaves.ProcessedTime, models.DryLeaves.Processed_Weight),
+    "flour": (models.Flour.UserID, models.Flour.ProcessedTime, models.Flour.Flour_Weight),
+    "shipment": (models.Shipment.UserID, models.Shipment.ShipmentDate, models.Shipment.ShipmentQuantity),
+}
+
+def add_production_daily(db: Session, stage: str, user_id: str, day: datetime, delta: float):
+    # Rows without a date (e.g. shipments not sent yet) are not part of any day
+    if day is None or not delta:
+        return
+    if isinstance(day, datetime):
+        day = day.date()
+    stmt = insert(models.ProductionDaily).values(UserID=str(user_id), Day=day, Stage=stage, Total=delta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.ProductionDaily.UserID, models.ProductionDaily.Day, models.ProductionDaily.Stage],
+        set_={"Total": models.ProductionDaily.Total + delta},
+    )
+    db.execute(stmt)
+
+def get_production_timeseries(db: Session, date_from: date, date_to: date, granularity: str = "day", user_id: str = None):
+    if granularity == "day":
+        period = models.ProductionDaily.Day
+    elif granularity in ("week", "month"):
+        period = cast(func.date_trunc(granularity, models.ProductionDaily.Day), Date)
+    else:
+        raise ValueError("Invalid granularity. Choose 'day', 'week' or 'month'.")
+
+    query = db.query(period, models.ProductionDaily.Stage, func.sum(models.ProductionDaily.Total)).filter(
+        models.ProductionDaily.Day >= date_from,
+        models.ProductionDaily.Day <= date_to,
+    )
+    if user_id is not None:
+        query = query.filter(models.ProductionDaily.UserID == normalize_user_id(user_id))
+    query = query.group_by(period, models.ProductionDaily.Stage).order_by(period)
+
+    series = {}
+    for day, stage, total in query:
+        series.setdefault(day, dict.fromkeys(PRODUCTION_STAGES, 0))[stage] = total or 0
+    return [{"period": day, **totals} for day, totals in series.items()]
+
+def rebuild_production_daily(db: Session):
+    db.query(models.ProductionDaily).delete()
+    count = 0
+    for stage, (user_id_column, time_column, value_column) in PRODUCTION_STAGES.items():
+        day = cast(time_column, Date)
+        rows = (
+            db.query(user_id_column, day, func.sum(value_column))
+            .filter(user_id_column.isnot(None), time_column.isnot(None))
+            .group_by(user_id_column, day)
+        )
+        for user_id, row_day, total in rows:
+            db.add(models.ProductionDaily(UserID=user_id, Day=row_day, Stage=stage, Total=total or 0))
+            count += 1
+    db.commit()
+    return count
+
+# expiration
+EXPIRABLE_STAGES = {
+    "wet_leaves": (models.WetLeaves, models.WetLeaves.WetLeavesID),
+    "dry_leaves": (models.DryLeaves, models.DryLeaves.DryLeavesID),
+    "flour": (models.Flour, models.Flour.FlourID),
+}
+EXPIRED_STATUS = "Expired"
+
+def expire_stock(db: Session, now: datetime = None, batch_size: int = 1000):
+    # Marks stock still awaiting processing past its Expiration, batch_size rows per UPDATE and
+    # transaction so locks stay short. The batch select rides the partial Expiration index,
+    # and SKIP LOCKED lets several workers sweep at once without waiting on each other.
+    now = now or datetime.now()
+    counts = {}
+    for stage, (model, id_column) in EXPIRABLE_STAGES.items():
+        counts[stage] = 0
+        while True:
+            batch = (
+                select(id_column)
+                .where(model.Status == "Awaiting", model.Expiration <= now)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            result = db.execute(
+                update(model).where(id_column.in_(batch)).values(Status=EXPIRED_STATUS),
+                execution_options={"synchronize_session": False},
+            )
+            db.commit()
+            counts[stage] += result.rowcount
+            if result.rowcount < batch_size:
+                break
+    return counts
+
 # location
 def create_location(db: Session, location: schemas.LocationCreate):
     db_location = models.Location(**location.dict())
@@ -711,6 +1241,7 @@ def delete_location_by_id(db: Session, location_id: int):
 def create_admin_settings(db: Session, admin_settings: schemas.AdminSettingsCreate):
     db_admin_settings = models.AdminSettings(**admin_settings.dict())
     db.add(db_admin_settings)
+    bump_reference_version(db)
     db.commit()
     db.refresh(db_admin_settings)
     return db_admin_settings
@@ -723,6 +1254,7 @@ def update_admin_settings(db: Session, admin_settings_id: int, admin_settings_up
     if not admin_settings:
         return None
     admin_settings.AdminFeeValue = admin_settings_update.AdminFeeValue
+    bump_reference_version(db)
     db.commit()
     db.refresh(admin_settings)
     return admin_settings
@@ -731,12 +1263,13 @@ def update_admin_settings(db: Session, admin_settings_id: int, admin_settings_up
 def create_product(db: Session, product: schemas.ProductsCreate):
     db_product = models.Products(**product.dict())
     db.add(db_product)
+    bump_reference_version(db)
     db.commit()
     db.refresh(db_product)
     return db_product
 
-def get_products(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.Products).offset(skip).limit(limit).all()
+def get_products(db: Session, skip: int = 0, limit: int = 10, after: str = None):
+    return paginate_offset(db.query(models.Products), models.Products.ProductID, skip, limit, after)
 
 def get_product_by_id(db: Session, product_id: int):
     return db.query(models.Products).filter(models.Products.ProductID == product_id).first()
@@ -746,6 +1279,7 @@ def update_product(db: Session, product_id: int, product_update: schemas.Product
     if not product:
         return None
     product.ProductName = product_update.ProductName
+    bump_reference_version(db)
     db.commit()
     db.refresh(product)
     return product
@@ -754,6 +1288,7 @@ def delete_product(db: Session, product_id: int):
     product = db.query(models.Products).filter(models.Products.ProductID == product_id).first()
     if product:
         db.delete(product)
+        bump_reference_version(db)
         db.commit()
         return True
     return False
@@ -824,6 +1359,7 @@ def delete_centra_initial_price(db: Session, initial_price_id: int):
 def create_discount_condition(db: Session, discount_condition: schemas.DiscountConditionCreate):
     db_discount_condition = models.DiscountCondition(**discount_condition.dict())
     db.add(db_discount_condition)
+    bump_reference_version(db)
     db.commit()
     db.refresh(db_discount_condition)
     return db_discount_condition
@@ -837,6 +1373,7 @@ def update_discount_condition(db: Session, discount_condition_id: int, discount_
         return None
     discount_condition.DiscountRate = discount_condition_update.DiscountRate
     discount_condition.ExpDayLeft = discount_condition_update.ExpDayLeft
+    bump_reference_version(db)
     db.commit()
     db.refresh(discount_condition)
     return discount_condition
@@ -845,25 +1382,33 @@ def delete_discount_condition(db: Session, discount_condition_id: int):
     discount_condition = db.query(models.DiscountCondition).filter(models.DiscountCondition.DiscountConditionID == discount_condition_id).first()
     if discount_condition:
         db.delete(discount_condition)
+        bump_reference_version(db)
         db.commit()
         return True
     return False
 
 # MarketShipment
-def create_market_shipment(db: Session, market_shipment: schemas.MarketShipmentCreate):
-    # Convert UUIDs to strings before querying
-    centra_id_str = str(market_shipment.CentraID)
-    customer_id_str = str(market_shipment.CustomerID)
+def check_market_shipment_parties(db: Session, centra_id=None, customer_id=None):
+    # Both parties' roles come back in one query and are compared against the cached role table
+    user_ids = [str(user_id) for user_id in (centra_id, customer_id) if user_id is not None]
+    if not user_ids:
+        return
+    user_roles = dict(db.query(models.User.UserID, models.User.RoleID).filter(models.User.UserID.in_(user_ids)))
 
     # Validate that the CentraID user has the "Centra" role
-    centra_user = db.query(models.User).filter(models.User.UserID == centra_id_str).first()
-    if not centra_user or centra_user.RoleID != 1:  # Assuming RoleID 1 is for "Centra"
-        raise HTTPException(status_code=400, detail="CentraID must reference a user with the 'Centra' role.")
+    if centra_id is not None:
+        centra_role_id = reference_data.role_id_by_name("Centra")
+        if centra_role_id is None or user_roles.get(str(centra_id)) != centra_role_id:
+            raise HTTPException(status_code=400, detail="CentraID must reference a user with the 'Centra' role.")
 
     # Validate that the CustomerID user has the "Customer" role
-    customer_user = db.query(models.User).filter(models.User.UserID == customer_id_str).first()
-    if not customer_user or customer_user.RoleID != 5:  # Assuming RoleID 5 is for "Customer"
-        raise HTTPException(status_code=400, detail="CustomerID must reference a user with the 'Customer' role.")
+    if customer_id is not None:
+        customer_role_id = reference_data.role_id_by_name("Customer")
+        if customer_role_id is None or user_roles.get(str(customer_id)) != customer_role_id:
+            raise HTTPException(status_code=400, detail="CustomerID must reference a user with the 'Customer' role.")
+
+def create_market_shipment(db: Session, market_shipment: schemas.MarketShipmentCreate):
+    check_market_shipment_parties(db, market_shipment.CentraID, market_shipment.CustomerID)
 
     db_market_shipment = models.MarketShipment(
         CentraID=market_shipment.CentraID,
@@ -878,8 +1423,8 @@ def create_market_shipment(db: Session, market_shipment: schemas.MarketShipmentC
     return db_market_shipment
 
 
-def get_market_shipments(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.MarketShipment).offset(skip).limit(limit).all()
+def get_market_shipments(db: Session, skip: int = 0, limit: int = 10, after: str = None):
+    return paginate_offset(db.query(models.MarketShipment), models.MarketShipment.MarketShipmentID, skip, limit, after)
 
 def get_market_shipment_by_id(db: Session, market_shipment_id: int):
     return db.query(models.MarketShipment).filter(models.MarketShipment.MarketShipmentID == market_shipment_id).first()
@@ -889,18 +1434,11 @@ def update_market_shipment(db: Session, market_shipment_id: int, market_shipment
     if not db_market_shipment:
         return None
 
-    # Validate if CentraID is being updated
+    # Validate CentraID and CustomerID if either is being updated
+    check_market_shipment_parties(db, market_shipment_update.CentraID, market_shipment_update.CustomerID)
     if market_shipment_update.CentraID is not None:
-        centra_user = db.query(models.User).filter(models.User.UserID == market_shipment_update.CentraID).first()
-        if not centra_user or centra_user.RoleID != 1:  # Assuming RoleID 1 is for "Centra"
-            raise HTTPException(status_code=400, detail="CentraID must reference a user with the 'Centra' role.")
         db_market_shipment.CentraID = market_shipment_update.CentraID
-
-    # Validate if CustomerID is being updated
     if market_shipment_update.CustomerID is not None:
-        customer_user = db.query(models.User).filter(models.User.UserID == market_shipment_update.CustomerID).first()
-        if not customer_user or customer_user.RoleID != 5:  # Assuming RoleID 5 is for "Customer"
-            raise HTTPException(status_code=400, detail="CustomerID must reference a user with the 'Customer' role.")
         db_market_shipment.CustomerID = market_shipment_update.CustomerID
 
     if market_shipment_update.DryLeavesID is not None:
@@ -1185,37 +1723,34 @@ def get_centra_cities(db: Session):
 from itertools import groupby
 from operator import itemgetter
 
-def get_items(db: Session, item_type: str, limit: int = 100):
-    # Fetch data based on item type
-    if item_type.lower() == 'flour':
-        items = db.query(models.Flour).limit(limit).all()
-    elif item_type.lower() == 'dry_leaves':
-        items = db.query(models.DryLeaves).limit(limit).all()
-    else:
+ITEM_COLUMNS = {
+    'flour': (models.Flour, models.Flour.FlourID, models.Flour.Flour_Weight),
+    'dry_leaves': (models.DryLeaves, models.DryLeaves.DryLeavesID, models.DryLeaves.Processed_Weight),
+}
+
+def get_items(db: Session, item_type: str, limit: int = 100, after: str = None, status: str = None,
+              expires_after: datetime = None, expires_before: datetime = None):
+    if item_type.lower() not in ITEM_COLUMNS:
         raise ValueError("Invalid item type. Choose 'flour' or 'dry_leaves'.")
+    model, id_column, weight_column = ITEM_COLUMNS[item_type.lower()]
 
-    # Initialize the dictionary to group items by username
+    # One joined query brings the username along with each item; the inner join drops
+    # items without a user, as the old per-item lookup did
+    query = (
+        db.query(id_column, weight_column, models.User.Username)
+        .join(models.User, models.User.UserID == model.UserID)
+    )
+    if status is not None:
+        query = query.filter(model.Status == status)
+    if expires_after is not None:
+        query = query.filter(model.Expiration >= expires_after)
+    if expires_before is not None:
+        query = query.filter(model.Expiration < expires_before)
+    rows, next_cursor = paginate(query, id_column, after=after, limit=limit)
+
+    # Group by username in a single pass
     grouped_data = {}
+    for item_id, weight, username in rows:
+        grouped_data.setdefault(username, []).append({"id": item_id, "weight": weight})
 
-    # Iterate through each item to populate grouped_data
-    for item in items:
-        user_id = item.UserID  # Assuming each item has a 'UserID' attribute
-        user = get_user_by_id(db, user_id)
-        if not user:
-            continue
-
-        username = user.Username
-
-        # Check item type to determine structure
-        if item_type.lower() == 'dry_leaves':
-            item_data = {"id": item.DryLeavesID, "weight": item.Processed_Weight}
-        elif item_type.lower() == 'flour':
-            item_data = {"id": item.FlourID, "weight": item.Flour_Weight}
-       
-        # Group by username
-        if username not in grouped_data:
-            grouped_data[username] = [item_data]
-        else:
-            grouped_data[username].append(item_data)
-
-    return grouped_data
+    return grouped_data, next_cursor
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def check_in_token() -> str:
+    """Harbor check-in code for a shipment: 128 random bits, stored and never re-derived."""
+    return secrets.token_hex(16)
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full; callers should answer 503 rather than wait."""
+
+
+def _hash(secret: bytes) -> bytes:
+    return bcrypt.hashpw(secret, bcrypt.gensalt())
+
+
+def _check(secret: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(secret, hashed)
+
+
+class HashingService:
+    """Runs bcrypt on a bounded pool so CPU-bound hashing never occupies request threads.
+
+    At most `workers` hashes run at once and at most `max_queue` more may wait; beyond that
+    new work is refused with HashingBusy. bcrypt releases the GIL, so threads already hash in
+    parallel; `use_processes` moves the work out of the server process entirely.
+    """
+
+    def __init__(self, workers: int, max_queue: int, use_processes: bool = False):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.use_processes = use_processes
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use so forked server workers each get their own pool
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HashingBusy("Hashing queue is full")
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            executor = self._get_executor()
+        started = time.monotonic()
+
+        def done(_):
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+                self.total_seconds += time.monotonic() - started
+
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+        future.add_done_callback(done)
+        return future
+
+    async def hash(self, secret: str) -> bytes:
+        return await asyncio.wrap_future(self._submit(_hash, secret.encode('utf-8')))
+
+    async def check(self, secret: str, hashed) -> bool:
+        if isinstance(hashed, str):
+            hashed = hashed.encode('utf-8')
+        return await asyncio.wrap_future(self._submit(_check, secret.encode('utf-8'), hashed))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pool": "process" if self.use_processes else "thread",
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queued": max(0, self.in_flight - self.workers),
+                "peak_in_flight": self.peak_in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "average_seconds": self.total_seconds / self.completed if self.completed else 0.0,
+            }
+
+
+hashing_service = HashingService(
+    workers=int(os.getenv("HASHING_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    max_queue=int(os.getenv("HASHING_MAX_QUEUE", "100")),
+    use_processes=os.getenv("HASHING_POOL", "thread").lower() == "process",
+)
@@ -0,0 +1,157 @@
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class MailQueue:
+    """In-process outbox drained by worker threads over persistent SMTP connections.
+
+    `send` only enqueues, so request handlers return without waiting on the mail server.
+    Each worker keeps its own authenticated connection open between messages, closes it
+    after `idle_timeout` seconds without work, and retries failed sends with exponential
+    backoff before giving up on a message.
+    """
+
+    def __init__(self, host: str, port: int, username: str = None, password: str = None, sender: str = None,
+                 starttls: bool = True, workers: int = 2, max_attempts: int = 5, backoff: float = 1.0,
+                 idle_timeout: float = 60, timeout: float = 10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender or username
+        self.starttls = starttls
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def send(self, to: str, subject: str, body: str):
+        message = EmailMessage()
+        if self.sender:
+            message["From"] = self.sender
+        message["To"] = to
+        message["Subject"] = subject
+        message.set_content(body)
+        self._queue.put(message)
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.username:
+            server.login(self.username, self.password)
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _deliver(self, server, message):
+        # Returns the connection to keep using, or None once it has been dropped
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                if server is None:
+                    server = self._connect()
+                server.send_message(message)
+                with self._lock:
+                    self.sent += 1
+                return server
+            except (smtplib.SMTPException, OSError) as e:
+                if server is not None:
+                    self._close(server)
+                    server = None
+                if attempt == self.max_attempts:
+                    with self._lock:
+                        self.failed += 1
+                    print(f"Giving up on mail to {message['To']} after {attempt} attempts: {e}")
+                    return None
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            except Exception as e:
+                # Anything else (bad credentials config, a malformed message) will not fix
+                # itself on retry; drop the message but keep the worker alive
+                if server is not None:
+                    self._close(server)
+                with self._lock:
+                    self.failed += 1
+                print(f"Giving up on mail to {message['To']}: {e!r}")
+                return None
+
+    def _work(self):
+        server = None
+        while True:
+            try:
+                message = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                if server is not None:
+                    self._close(server)
+                    server = None
+                continue
+            if message is None:
+                self._queue.task_done()
+                break
+            try:
+                server = self._deliver(server, message)
+            finally:
+                self._queue.task_done()
+        if server is not None:
+            self._close(server)
+
+    def start(self):
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"mail-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        # Workers finish what is already queued before they see the sentinel
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "workers": sum(thread.is_alive() for thread in self._threads),
+                "sent": self.sent,
+                "retries": self.retries,
+                "failed": self.failed,
+            }
+
+
+# Point SMTP_HOST/SMTP_PORT at a local stand-in (with SMTP_STARTTLS=false) to run without Gmail
+mail_queue = MailQueue(
+    host=os.getenv("SMTP_HOST", "smtp.gmail.com"),
+    port=int(os.getenv("SMTP_PORT", "587")),
+    username=os.getenv("EMAIL"),
+    password=os.getenv("PASSWORD"),
+    sender=os.getenv("MAIL_FROM"),
+    starttls=os.getenv("SMTP_STARTTLS", "true").lower() == "true",
+    workers=int(os.getenv("MAIL_WORKERS", "2")),
+    max_attempts=int(os.getenv("MAIL_MAX_ATTEMPTS", "5")),
+    backoff=float(os.getenv("MAIL_RETRY_BACKOFF", "1")),
+    idle_timeout=float(os.getenv("SMTP_IDLE_TIMEOUT", "60")),
+)
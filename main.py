@@ -5,31 +5,50 @@ from typing import List
 import uvicorn
 import uuid
 from BasicVerifier import BasicVerifier
-from fastapi_sessions.backends.implementations import InMemoryBackend
+from DatabaseBackend import DatabaseBackend
 from schemas import User, SessionData
 from uuid import UUID, uuid4
 from fastapi.middleware.cors import CORSMiddleware
 import crud
+import async_crud
 import requests
 import base64
 import models
 import schemas
 from schemas import InvoiceRequest
-import bcrypt
 from typing import List, Union, Dict
-from database import SessionLocal, engine
+from database import SessionLocal, engine, pool_stats, AsyncSessionLocal, async_engine, async_pool_stats, DB_ASYNC_READS
+from cache import statistics_cache, session_cache
+from sweeper import expiration_sweeper, session_sweeper
+from mailer import mail_queue
+from hashing import hashing_service, HashingBusy
+from reference import reference_data
+import migrate
 from fastapi_sessions.frontends.implementations import SessionCookie, CookieParameters
 from fastapi_sessions.session_verifier import SessionVerifier
 
-models.Base.metadata.create_all(bind=engine)
+migrate.run_migrations(engine)
 import pyotp
-from datetime import datetime, timedelta    
-import smtplib
+from datetime import datetime, timedelta, date
+import asyncio
+import csv
+import io
+import json
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 import os
+
+load_dotenv()
+
+ASYNC_READS = DB_ASYNC_READS
+
 app = FastAPI()
 
-backend = InMemoryBackend[UUID, SessionData]()
+backend = DatabaseBackend(
+    SessionLocal,
+    lifetime=timedelta(seconds=int(os.getenv("SESSION_LIFETIME", str(7 * 24 * 3600)))),
+    cache=session_cache,
+)
 
 verifier = BasicVerifier(
     identifier="general_verifier",
@@ -44,25 +63,82 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-@app.middleware("http")
-async def db_session_middleware(request: Request, call_next):
-    response = Response("Internal server error", status_code=500)
-    try:
-        request.state.db = SessionLocal()
-        response = await call_next(request)
-    finally:
-        request.state.db.close()
-    return response
-
-def get_db():
+@app.on_event("startup")
+def start_background_workers():
+    expiration_sweeper.start()
+    session_sweeper.start()
+    mail_queue.start()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    expiration_sweeper.stop()
+    session_sweeper.stop()
+    mail_queue.stop()
+    hashing_service.shutdown()
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    if async_engine is not None:
+        await async_engine.dispose()
+
+@app.exception_handler(HashingBusy)
+async def hashing_busy_handler(request: Request, exc: HashingBusy):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+class DBSessionMiddleware:
+    """Closes the request's database session, if anything opened one, once the response is sent.
+
+    Plain ASGI rather than @app.middleware("http"), which wraps every request, preflights
+    included, in an extra task and response stream.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # request.state is backed by scope["state"]
+            db = scope.get("state", {}).pop("db", None)
+            if db is not None:
+                await run_in_threadpool(db.close)
+
+app.add_middleware(DBSessionMiddleware)
+
+def get_db(request: Request):
+    # One session per request, created by the first dependency that needs it; FastAPI caches
+    # the dependency, so handlers and their sub-dependencies all share it
+    db = getattr(request.state, "db", None)
+    if db is None:
+        db = request.state.db = SessionLocal()
+    return db
+
+def read_with_session(read, *args, **kwargs):
+    # Sessions are not thread-safe, so each concurrent read checks out its own pooled connection
     db = SessionLocal()
     try:
-        yield db
+        return read(db, *args, **kwargs)
     finally:
         db.close()
 
+async def run_read(read, *args, **kwargs):
+    # `read` is a crud function; its async_crud namesake runs instead when ASYNC_READS is on,
+    # so a request waiting on the database holds no thread. Each call gets its own session.
+    if ASYNC_READS:
+        async with AsyncSessionLocal() as db:
+            return await getattr(async_crud, read.__name__)(db, *args, **kwargs)
+    return await run_in_threadpool(read_with_session, read, *args, **kwargs)
+
+def read_production_totals(cache_key, user_id: str = None):
+    return statistics_cache.get_or_set_async(cache_key, lambda: run_read(crud.get_production_totals, user_id))
+
 cookie_params = CookieParameters(
     secure=True,  # Ensures cookie is sent over HTTPS
     httponly=True,
@@ -97,8 +173,6 @@ async def create_session(user_id: str, response: Response, db: Session = Depends
 
     response.headers["Set-Cookie"] += "; SameSite=None"
 
-    crud.create_session(db, session, user_id)
-
     return f"created session for {user_id}"
 
 
@@ -108,67 +182,78 @@ async def whoami(session_data: SessionData = Depends(verifier)):
 
 
 @app.delete("/delete_session", dependencies=[Depends(cookie)], tags=["Sessions"])
-async def del_session(response: Response, session_id: UUID = Depends(cookie), db: Session = Depends(get_db)):
+async def del_session(response: Response, session_id: UUID = Depends(cookie)):
     await backend.delete(session_id)
     cookie.delete_from_response(response)
 
     response.headers["Set-Cookie"] += "; SameSite=None"
 
-    crud.delete_session(db)
-
     return "deleted session"
 
 # OTP
 @app.post("/generate_otp", tags=["OTP"])
-def generate_otp(request: schemas.GenerateOTPRequest, db: Session = Depends(get_db)):
+async def generate_otp(request: schemas.GenerateOTPRequest, db: Session = Depends(get_db)):
     email = request.email
     
     secret = pyotp.random_base32()
     otp = pyotp.TOTP(secret)
     otp_code = otp.now()
 
-    db_otp = crud.get_otp_by_email(db, email)    
-    if db_otp:
-        crud.delete_otp(db, email)
-
-    hashed_otp_code = bcrypt.hashpw(otp_code.encode('utf-8'), bcrypt.gensalt())
+    # bcrypt runs on the hashing pool; the request only awaits it
+    hashed_otp_code = await hashing_service.hash(otp_code)
 
     otp_create = schemas.OTPCreate(email=email, otp_code=hashed_otp_code, expires_at=datetime.now() + timedelta(minutes=2))
-    crud.create_otp(db, otp_create)
 
-    server = smtplib.SMTP('smtp.gmail.com', 587)
-    server.starttls()
+    def store_otp():
+        db_otp = crud.get_otp_by_email(db, email)
+        if db_otp:
+            crud.delete_otp(db, email)
+        crud.create_otp(db, otp_create)
 
-    load_dotenv()
-    USER_EMAIL = os.getenv("EMAIL")
-    USER_PASSWORD = os.getenv("PASSWORD")
-    
-    server.login(USER_EMAIL, USER_PASSWORD)
+    await run_in_threadpool(store_otp)
 
+    # Delivery happens on the mail workers; the OTP is already stored, so return right away
     body = f"Your OTP is {otp_code}."
     subject = "OTP verification using python" 
-    message = f'subject:{subject}\n\n{body}'
-
-    server.sendmail(USER_EMAIL, email, message)
-    server.quit()
+    mail_queue.send(email, subject, body)
 
-    print(f"OTP has been sent to {email}")
+    print(f"OTP has been queued for {email}")
     print(f"Generated OTP code for {email}: {otp_code}")
 
     return {"message": "OTP generated and sent to your email"}
 
+@app.get("/database/pool", tags=["Database"])
+def retrieve_pool_stats():
+    return pool_stats()
+
+@app.get("/database/async_pool", tags=["Database"])
+def retrieve_async_pool_stats():
+    stats = async_pool_stats()
+    if stats is None:
+        raise HTTPException(status_code=404, detail="async reads are disabled (DB_ASYNC_READS=false)")
+    return stats
+
+@app.get("/hashing/stats", tags=["OTP"])
+def retrieve_hashing_stats():
+    return hashing_service.stats()
+
+@app.get("/otp/mail_queue", tags=["OTP"])
+def retrieve_mail_queue_stats():
+    return mail_queue.stats()
+
 # Endpoint to verify OTP
 @app.post("/verify_otp", tags=["OTP"])
-def verify_otp(request: schemas.VerifyOTPRequest, db: Session = Depends(get_db)):
+async def verify_otp(request: schemas.VerifyOTPRequest, db: Session = Depends(get_db)):
     email = request.email
     otp_code = request.otp_code
 
-    db_otp = crud.get_otp_by_email(db, email)
-    if not db_otp or not bcrypt.checkpw(otp_code.encode('utf-8'), db_otp.otp_code.encode('utf-8')) or db_otp.expires_at < datetime.now():
+    db_otp = await run_in_threadpool(crud.get_otp_by_email, db, email)
+    # Expiry is checked first so stale codes never cost a bcrypt round
+    if not db_otp or db_otp.expires_at < datetime.now() or not await hashing_service.check(otp_code, db_otp.otp_code):
         raise HTTPException(status_code=400, detail="Invalid or expired OTP")
     
     # OTP is valid, delete it from the database
-    crud.delete_otp(db, email)
+    await run_in_threadpool(crud.delete_otp, db, email)
     
     return {"message": "OTP verified successfully"}
 
@@ -200,8 +285,12 @@ def create_role(role: schemas.RoleCreate, db: Session = Depends(get_db)):
     return crud.create_role(db=db, role=role)
 
 @app.get("/roles/get", response_model=List[schemas.RoleBase], tags=["Roles"])
-def get_roles(db: Session = Depends(get_db)):
-    return crud.get_roles(db=db)
+def get_roles():
+    return reference_data.roles()
+
+@app.get("/reference_data/stats", tags=["Roles"])
+def retrieve_reference_data_stats():
+    return reference_data.stats()
 
 @app.delete("/roles/delete/{role_id}", response_class=JSONResponse, tags=["Roles"])
 def delete_user(role_id: str, db: Session = Depends(get_db)):
@@ -215,17 +304,23 @@ def delete_user(role_id: str, db: Session = Depends(get_db)):
 @app.post('/user/post', response_model=schemas.User, tags=["Users"])
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     # Check if role exists, if not, return error
-    role = crud.get_role(db, role_id=user.RoleID)
+    role = reference_data.role(user.RoleID)
     if not role:
         raise HTTPException(status_code=400, detail="Role does not exist")
 
     # Create a new user
     return crud.create_user(db=db, user=user)
 
+def set_next_cursor(response: Response, next_cursor: str):
+    # List endpoints keep returning plain arrays; the cursor for the next page travels in a header
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+
 @app.get("/user/get", response_model=List[schemas.User], tags=["Users"])
-def get_users(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    print(f"Fetching users with skip={skip}, limit={limit}")
-    users = crud.get_users(db, skip=skip, limit=limit)
+def get_users(response: Response, skip: int = 0, limit: int = Query(10, ge=1, le=1000), after: str = None, db: Session = Depends(get_db)):
+    print(f"Fetching users with skip={skip}, limit={limit}, after={after}")
+    users, next_cursor = crud.get_users(db, skip=skip, limit=limit, after=after)
+    set_next_cursor(response, next_cursor)
     print(f"Fetched {len(users)} users")
     return users
 
@@ -285,16 +380,7 @@ def update_user(user_id: str, user: schemas.AdminUserUpdate, db: Session = Depen
 
 @app.put('/user/update_role/{user_id}', response_model=schemas.User, tags=["Users"])
 def update_user_role(user_id: str, role_update: schemas.UserRoleUpdate, db: Session = Depends(get_db)):
-    role_name_to_id = {
-        "Centra": 1,
-        "Harbor": 2,
-        "Company": 3,
-        "Admin": 4,
-        "Customer": 5,
-        "Rejected": 6
-    }
-    role_id = role_name_to_id.get(role_update.RoleName)
-    print(role_id)
+    role_id = reference_data.role_id_by_name(role_update.RoleName)
     if role_id is None:
         raise HTTPException(status_code=400, detail="Invalid role name")
 
@@ -318,12 +404,12 @@ def create_courier(courier: schemas.CourierCreate, db: Session = Depends(get_db)
     return crud.create_courier(db, courier)
 
 @app.get("/courier/get", response_model=List[schemas.Courier], tags=["Courier"])
-def get_courier(db: Session = Depends(get_db)):
-    return crud.get_couriers(db)
+def get_courier():
+    return reference_data.couriers()
 
 @app.get("/courier/get/{courier_id}", response_model=schemas.Courier, tags=["Courier"])
-def get_courier_by_courier_id(courier_id:int, db: Session = Depends(get_db)):
-    return crud.get_courier_by_id(db, courier_id)   
+def get_courier_by_courier_id(courier_id:int):
+    return reference_data.courier(courier_id)   
 
 @app.delete("/courier/delete/{courier_id}", response_class=JSONResponse, tags=["Courier"])
 def delete_courier(courier_id: int, db: Session = Depends(get_db)):
@@ -338,27 +424,66 @@ def delete_courier(courier_id: int, db: Session = Depends(get_db)):
 def create_wet_leaves(wet_leaves: schemas.WetLeavesCreate, db: Session = Depends(get_db)):
     return crud.create_wet_leaves(db=db, wet_leaves=wet_leaves)
 
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "1000"))
+
+def parse_bulk_records(body: bytes, content_type: str) -> list:
+    # A JSON array, NDJSON (one object per line) or CSV with a header row. Lines that fail
+    # to parse are kept as exceptions so they are reported against their row number.
+    text = body.decode("utf-8-sig")
+    if "csv" in content_type:
+        return [
+            {key: value for key, value in record.items() if value not in ("", None)}
+            for record in csv.DictReader(io.StringIO(text))
+        ]
+    if "ndjson" in content_type or "jsonl" in content_type:
+        records = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                records.append(e)
+        return records
+    try:
+        records = json.loads(text)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of wet leaves records")
+    return records
+
+@app.post("/wetleaves/bulk", response_model=schemas.BulkIngestResult, tags=["WetLeaves"])
+async def bulk_create_wet_leaves(request: Request, chunk_size: int = Query(None, ge=1, le=10000), db: Session = Depends(get_db)):
+    records = parse_bulk_records(await request.body(), request.headers.get("content-type", ""))
+    return await run_in_threadpool(crud.bulk_create_wet_leaves, db, records, chunk_size or BULK_INSERT_CHUNK_SIZE)
+
 @app.get("/wetleaves/get", response_model=List[schemas.WetLeaves], tags=["WetLeaves"])
-def get_wet_leaves(limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_wet_leaves(db=db, limit=limit)
+async def get_wet_leaves(response: Response, limit: int = Query(100, ge=1, le=1000), after: str = None, order_by: str = "id", status: str = None):
+    try:
+        items, next_cursor = await run_read(crud.get_wet_leaves, limit=limit, after=after, order_by=order_by, status=status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, next_cursor)
+    return items
 
 @app.get("/wetleaves/get/{wet_leaves_id}", response_model=schemas.WetLeaves, tags=["WetLeaves"])
-def get_wet_leaves_id(wet_leaves_id: int, db: Session = Depends(get_db)):
-    wet_leaves = crud.get_wet_leaves_by_id(db=db, wet_leaves_id=wet_leaves_id)
+async def get_wet_leaves_id(wet_leaves_id: int):
+    wet_leaves = await run_read(crud.get_wet_leaves_by_id, wet_leaves_id=wet_leaves_id)
     if not wet_leaves:
         raise HTTPException(status_code=404, detail="wet leaves not found")
     return wet_leaves
 
 @app.get("/wetleaves/get_by_user/{user_id}", response_model=List[schemas.WetLeaves], tags=["WetLeaves"])
-def get_wet_leaves_by_user(user_id: str, db: Session = Depends(get_db)):
-    wet_leaves = crud.get_wet_leaves_by_user_id(db, user_id)
+async def get_wet_leaves_by_user(user_id: str, status: str = None):
+    wet_leaves = await run_read(crud.get_wet_leaves_by_user_id, user_id, status=status)
     if not wet_leaves:
         raise HTTPException(status_code=404, detail="wet leaves not found")
     return wet_leaves
 
 @app.get('/wetleaves/sum_weight_today/{user_id}', tags=["WetLeaves"])
-def get_sum_weight_wet_leaves_by_user_today(user_id: str, db: Session = Depends(get_db)):
-    total_weight = crud.sum_weight_wet_leaves_by_user_today(db, user_id)
+async def get_sum_weight_wet_leaves_by_user_today(user_id: str):
+    total_weight = await run_read(crud.sum_weight_wet_leaves_by_user_today, user_id)
     return {"user_id": user_id, "total_weight_today": total_weight}
 
 @app.delete("/wetleaves/delete/{wet_leaves_id}", response_class=JSONResponse, tags=["WetLeaves"])
@@ -376,6 +501,10 @@ def update_wet_leaves(wet_leaves_id: int, wet_leaves: schemas.WetLeavesUpdate, d
         raise HTTPException(status_code=404, detail="wet leaves not found")
     return update_wet_leaves
 
+@app.put("/wetleaves/update_status", response_model=schemas.WetLeavesBulkStatusResult, tags=["WetLeaves"])
+def bulk_update_wet_leaves_status(status_update: schemas.BulkStatusUpdate, db: Session = Depends(get_db)):
+    return crud.bulk_update_wet_leaves_status(db=db, status_update=status_update)
+
 @app.put("/wetleaves/update_status/{wet_leaves_id}", response_model=schemas.WetLeaves, tags=["WetLeaves"])
 def update_wet_leaves_status(wet_leaves_id: int, status_update: schemas.WetLeavesStatusUpdate, db: Session = Depends(get_db)):
     updated_wet_leaves = crud.update_wet_leaves_status(db=db, wet_leaves_id=wet_leaves_id, status_update=status_update)
@@ -389,19 +518,24 @@ def create_dry_leaves(dry_leaves: schemas.DryLeavesCreate, db: Session = Depends
     return crud.create_dry_leaves(db=db, dry_leaves=dry_leaves)
 
 @app.get("/dryleaves/get/", response_model=List[schemas.DryLeaves], tags=["DryLeaves"])
-def get_dry_leaves(limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_dry_leaves(db=db, limit=limit)
+async def get_dry_leaves(response: Response, limit: int = Query(100, ge=1, le=1000), after: str = None, order_by: str = "id", status: str = None):
+    try:
+        items, next_cursor = await run_read(crud.get_dry_leaves, limit=limit, after=after, order_by=order_by, status=status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, next_cursor)
+    return items
 
 @app.get("/dryleaves/get/{dry_leaves_id}", response_model=schemas.DryLeaves, tags=["DryLeaves"])
-def get_dry_leaves_id(dry_leaves_id: int, db: Session = Depends(get_db)):
-    dry_leaves = crud.get_dry_leaves_by_id(db=db, dry_leaves_id=dry_leaves_id)
+async def get_dry_leaves_id(dry_leaves_id: int):
+    dry_leaves = await run_read(crud.get_dry_leaves_by_id, dry_leaves_id=dry_leaves_id)
     if not dry_leaves:
         raise HTTPException(status_code=404, detail="dry leaves not found")
     return dry_leaves
 
 @app.get("/dryleaves/get_by_user/{user_id}", response_model=List[schemas.DryLeaves], tags=["DryLeaves"])
-def get_dry_leaves_by_user(user_id: str, db: Session = Depends(get_db)):
-    dry_leaves = crud.get_dry_leaves_by_user_id(db, user_id)
+async def get_dry_leaves_by_user(user_id: str, status: str = None):
+    dry_leaves = await run_read(crud.get_dry_leaves_by_user_id, user_id, status=status)
     if not dry_leaves:
         raise HTTPException(status_code=404, detail="Dry leaves not found")
     return dry_leaves
@@ -421,6 +555,10 @@ def update_dry_leaves(dry_leaves_id: int, dry_leaves: schemas.DryLeavesUpdate, d
         raise HTTPException(status_code=404, detail="dry leaves not found")
     return update_dry_leaves
 
+@app.put("/dryleaves/update_status", response_model=schemas.DryLeavesBulkStatusResult, tags=["DryLeaves"])
+def bulk_update_dry_leaves_status(status_update: schemas.BulkStatusUpdate, db: Session = Depends(get_db)):
+    return crud.bulk_update_dry_leaves_status(db=db, status_update=status_update)
+
 @app.put("/dryleaves/update_status/{dry_leaves_id}", response_model=schemas.DryLeaves, tags=["DryLeaves"])
 def update_dry_leaves_status(dry_leaves_id: int, status_update: schemas.DryLeavesStatusUpdate, db: Session = Depends(get_db)):
     updated_dry_leaves = crud.update_dry_leaves_status(db=db, dry_leaves_id=dry_leaves_id, status_update=status_update)
@@ -434,20 +572,25 @@ def create_flour(flour: schemas.FlourCreate, db: Session = Depends(get_db)):
     return crud.create_flour(db=db, flour=flour)
 
 @app.get("/flour/get", response_model=List[schemas.Flour], tags=["Flour"])
-def get_flour(limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_flour(db=db, limit=limit)
+async def get_flour(response: Response, limit: int = Query(100, ge=1, le=1000), after: str = None, order_by: str = "id", status: str = None):
+    try:
+        items, next_cursor = await run_read(crud.get_flour, limit=limit, after=after, order_by=order_by, status=status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, next_cursor)
+    return items
 
 @app.get("/flour/get/{flour_id}", response_model=schemas.Flour, tags=["Flour"])
-def get_flour_by_id(flour_id: int, db: Session = Depends(get_db)):
-    flour = crud.get_flour_by_id(db=db, flour_id=flour_id)
+async def get_flour_by_id(flour_id: int):
+    flour = await run_read(crud.get_flour_by_id, flour_id=flour_id)
     if not flour:
         raise HTTPException(status_code=404, detail="flour not found")
     else:
         return flour
 
 @app.get("/flour/get_by_user/{user_id}", response_model=List[schemas.Flour], tags=["Flour"])
-def get_flour_by_user(user_id: str, db: Session = Depends(get_db)):
-    flour = crud.get_flour_by_user_id(db, user_id)
+async def get_flour_by_user(user_id: str, status: str = None):
+    flour = await run_read(crud.get_flour_by_user_id, user_id, status=status)
     if not flour:
         raise HTTPException(status_code=404, detail="flour not found")
     return flour
@@ -467,6 +610,10 @@ def update_flour(flour_id: int, flour: schemas.FlourUpdate, db: Session = Depend
         raise HTTPException(status_code=404, detail="flour not found")
     return update_flour
 
+@app.put("/flour/update_status", response_model=schemas.FlourBulkStatusResult, tags=["Flour"])
+def bulk_update_flour_status(status_update: schemas.BulkStatusUpdate, db: Session = Depends(get_db)):
+    return crud.bulk_update_flour_status(db=db, status_update=status_update)
+
 @app.put("/flour/update_status/{flour_id}", response_model=schemas.Flour, tags=["Flour"])
 def update_flour_status(flour_id: int, status_update: schemas.FlourStatusUpdate, db: Session = Depends(get_db)):
     updated_flour = crud.update_flour_status(db=db, flour_id=flour_id, status_update=status_update)
@@ -475,24 +622,40 @@ def update_flour_status(flour_id: int, status_update: schemas.FlourStatusUpdate,
     return updated_flour
 
 # Shipment
-@app.post('/shipment/post', response_model=schemas.Shipment, tags=["Shipment"])
+@app.post('/shipment/post', response_model=schemas.ShipmentCreated, tags=["Shipment"])
 def create_shipment(shipment: schemas.ShipmentCreate, db: Session = Depends(get_db)):
     return crud.create_shipment(db=db, shipment=shipment)
 
 @app.get('/shipment/get', response_model=List[schemas.Shipment], tags=["Shipment"])
-def get_shipment(limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_shipment(db=db, limit=limit)
+async def get_shipment(response: Response, limit: int = Query(100, ge=1, le=1000), after: str = None, order_by: str = "id"):
+    try:
+        items, next_cursor = await run_read(crud.get_shipment, limit=limit, after=after, order_by=order_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, next_cursor)
+    return items
 
 @app.get('/shipment/getid/{shipment_id}', response_model=schemas.Shipment, tags=["Shipment"])
-def get_shipment_by_id(shipment_id: int, db: Session = Depends(get_db)):
-    shipment = crud.get_shipment_by_id(db=db, shipment_id=shipment_id)
+async def get_shipment_by_id(shipment_id: int):
+    shipment = await run_read(crud.get_shipment_by_id, shipment_id=shipment_id)
     if not shipment:
         raise HTTPException(status_code=404, detail="shipment not found")
     return shipment
 
+@app.get("/shipment/lineage", response_model=List[schemas.ShipmentLineage], tags=["Shipment"])
+def get_shipments_lineage(shipment_ids: List[int] = Query(...), db: Session = Depends(get_db)):
+    return crud.get_shipment_lineage(db, shipment_ids)
+
+@app.get("/shipment/{shipment_id}/lineage", response_model=schemas.ShipmentLineage, tags=["Shipment"])
+def get_shipment_lineage(shipment_id: int, db: Session = Depends(get_db)):
+    lineage = crud.get_shipment_lineage(db, [shipment_id])
+    if not lineage:
+        raise HTTPException(status_code=404, detail="shipment not found")
+    return lineage[0]
+
 @app.get("/shipment/get_by_user/{user_id}", response_model=List[schemas.Shipment], tags=["Shipment"])
-def get_shipment_by_user(user_id: str, db: Session = Depends(get_db)):
-    shipment_data = crud.get_shipment_by_user_id(db, user_id)
+async def get_shipment_by_user(user_id: str):
+    shipment_data = await run_read(crud.get_shipment_by_user_id, user_id)
     if not shipment_data:
         raise HTTPException(status_code=404, detail="shipments not found")
     return shipment_data
@@ -503,26 +666,12 @@ def get_all_shipment_ids(db: Session = Depends(get_db)):
     print(f"All shipment IDs: {[shipment.ShipmentID for shipment in shipments]}")
     return [shipment.ShipmentID for shipment in shipments]
 
-# Endpoint to compare shipment IDs
+# Endpoint to resolve a scanned harbor check-in code to the shipment awaiting check-in
 @app.get("/check_shipment_ids", response_model=List[str])
-def check_shipment_ids(db: Session = Depends(get_db)):
-    shipment_ids = crud.get_shipment_ids_with_date_but_no_checkin(db)
-    print(f"Fetched shipment IDs: {shipment_ids}")
-
-    # Example hashed ID to compare
-    known_shipment_id = "known_shipment_id"
-    hashed_shipment_id = bcrypt.hashpw(known_shipment_id.encode('utf-8'), bcrypt.gensalt())
-    print(f"Hashed shipment ID: {hashed_shipment_id}")
-
-    def brute_force_check(shipment_id):
-        if bcrypt.checkpw(shipment_id.encode('utf-8'), hashed_shipment_id):
-            return shipment_id
-        else:
-            print(f"No match for shipment ID: {shipment_id}")
-            return None
-
-    valid_shipment_ids = [brute_force_check(str(shipment_id)) for shipment_id in shipment_ids]
-    valid_shipment_ids = list(filter(None, valid_shipment_ids))  # Filter out None values
+def check_shipment_ids(code: str = None, db: Session = Depends(get_db)):
+    if not code:
+        return []
+    valid_shipment_ids = [str(shipment_id) for shipment_id in crud.get_shipment_ids_by_check_in_token(db, code)]
     print(f"Valid shipment IDs: {valid_shipment_ids}")
     return valid_shipment_ids
 
@@ -601,44 +750,72 @@ def delete_location_by_id(location_id: int, db: Session = Depends(get_db)):
         return {"message": "location not found or deletion failed"}
     
 @app.get('/statistics/all', tags=["Statistics"])
-def retrieve_all_stats(db: Session = Depends(get_db)):
-    sum_wet_leaves = crud.sum_total_wet_leaves(db)
-    sum_dry_leaves = crud.sum_total_dry_leaves(db)
-    sum_flour = crud.sum_total_flour(db)
-    sum_shipment_quantity = crud.sum_total_shipment_quantity(db)
-    
-    return {
-        "sum_wet_leaves": format_large_number(sum_wet_leaves),
-        "sum_dry_leaves": format_large_number(sum_dry_leaves),
-        "sum_flour": format_large_number(sum_flour),
-        "sum_shipment_quantity": format_large_number(sum_shipment_quantity)
-    }
+async def retrieve_all_stats():
+    totals = await read_production_totals(("totals",))
+    return {key: format_large_number(value) for key, value in totals.items()}
 
 @app.get('/statistics/all_no_format', tags=["Statistics"])
-def retrieve_all_stats_no_format(db: Session = Depends(get_db)):
-    sum_wet_leaves = crud.sum_total_wet_leaves(db)
-    sum_dry_leaves = crud.sum_total_dry_leaves(db)
-    sum_flour = crud.sum_total_flour(db)
-    sum_shipment_quantity = crud.sum_total_shipment_quantity(db)
+async def retrieve_all_stats_no_format():
+    return await read_production_totals(("totals",))
     
+@app.get('/expiration/sweeper', tags=["Expiration"])
+def retrieve_expiration_sweeper_stats():
+    return expiration_sweeper.stats()
+
+@app.get('/sessions/sweeper', tags=["Sessions"])
+def retrieve_session_sweeper_stats():
+    return session_sweeper.stats()
+
+@app.post('/expiration/sweep', tags=["Expiration"])
+def run_expiration_sweep():
+    return expiration_sweeper.run_once()
+
+@app.get('/statistics/cache', tags=["Statistics"])
+def retrieve_statistics_cache_stats():
+    return statistics_cache.stats()
+
+@app.get('/statistics/timeseries', response_model=List[schemas.ProductionTimeseriesPoint], tags=["Statistics"])
+def retrieve_production_timeseries(date_from: date = Query(alias="from"), date_to: date = Query(alias="to"), granularity: str = "day", user_id: str = None, db: Session = Depends(get_db)):
+    try:
+        return crud.get_production_timeseries(db, date_from, date_to, granularity=granularity, user_id=user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get('/centra/statistics', tags = ["Statistics"])
+def retrieve_all_centra_stats(user_ids: List[str] = Query(None), db: Session = Depends(get_db)):
+    cache_key = ("centra", tuple(sorted(user_ids)) if user_ids is not None else None)
+    centra_stats = statistics_cache.get_or_set(cache_key, lambda: crud.get_centra_statistics(db, user_ids))
     return {
-        "sum_wet_leaves": sum_wet_leaves,
-        "sum_dry_leaves": sum_dry_leaves,
-        "sum_flour": sum_flour,
-        "sum_shipment_quantity": sum_shipment_quantity
+        user_id: {key: format_large_number(value) for key, value in totals.items()}
+        for user_id, totals in centra_stats.items()
     }
-    
+
 @app.get('/centra/statistics/{user_id}', tags = ["Statistics"])
-def retrieve_centra_stats(user_id: str, db: Session = Depends(get_db)):
-    sum_wet_leaves = crud.sum_get_wet_leaves_by_user_id(db, user_id)
-    sum_dry_leaves = crud.sum_get_dry_leaves_by_user_id(db, user_id)
-    sum_flour = crud.sum_get_flour_by_user_id(db, user_id)
-    sum_shipment_quantity = crud.sum_get_shipment_quantity_by_user_id(db, user_id)
+async def retrieve_centra_stats(user_id: str):
+    totals = await read_production_totals(("centra", user_id), user_id)
+    return {key: format_large_number(value) for key, value in totals.items()}
+
+@app.get('/centra/{user_id}/dashboard', response_model=schemas.CentraDashboard, tags = ["Statistics"])
+async def retrieve_centra_dashboard(user_id: str):
+    # The reads are independent, so they run side by side and the response takes about as
+    # long as the slowest one instead of the sum of all of them
+    user_id = crud.normalize_user_id(user_id)
+    wet_leaves, dry_leaves, flour, shipments, totals, total_weight_today = await asyncio.gather(
+        run_read(crud.get_wet_leaves_by_user_id, user_id),
+        run_read(crud.get_dry_leaves_by_user_id, user_id),
+        run_read(crud.get_flour_by_user_id, user_id),
+        run_read(crud.get_shipment_by_user_id, user_id),
+        read_production_totals(("centra", user_id), user_id),
+        run_read(crud.sum_weight_wet_leaves_by_user_today, user_id),
+    )
     return {
-        "sum_wet_leaves": format_large_number(sum_wet_leaves),
-        "sum_dry_leaves": format_large_number(sum_dry_leaves),
-        "sum_flour": format_large_number(sum_flour),
-        "sum_shipment_quantity": format_large_number(sum_shipment_quantity)
+        "user_id": user_id,
+        "wet_leaves": wet_leaves,
+        "dry_leaves": dry_leaves,
+        "flour": flour,
+        "shipments": shipments,
+        "statistics": {key: format_large_number(value) for key, value in totals.items()},
+        "total_weight_today": total_weight_today,
     }
 
 # Shipment-Flour Associations
@@ -657,8 +834,8 @@ def create_admin_settings(admin_settings: schemas.AdminSettingsCreate, db: Sessi
     return crud.create_admin_settings(db=db, admin_settings=admin_settings)
 
 @app.get("/admin_settings/get", response_model=schemas.AdminSettings, tags=["Admin Settings"])
-def get_admin_settings(db: Session = Depends(get_db)):
-    return crud.get_admin_settings(db=db)
+def get_admin_settings():
+    return reference_data.admin_settings()
 
 @app.put("/admin_settings/put/{admin_settings_id}", response_model=schemas.AdminSettings, tags=["Admin Settings"])
 def update_admin_settings(admin_settings_id: int, admin_settings_update: schemas.AdminSettingsBase, db: Session = Depends(get_db)):
@@ -673,12 +850,14 @@ def create_product(product: schemas.ProductsCreate, db: Session = Depends(get_db
     return crud.create_product(db=db, product=product)
 
 @app.get("/products/get", response_model=List[schemas.Products], tags=["Products"])
-def get_products(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_products(db=db, skip=skip, limit=limit)
+def get_products(response: Response, skip: int = 0, limit: int = Query(10, ge=1, le=1000), after: str = None):
+    products, next_cursor = crud.paginate_rows(reference_data.products(), "ProductID", skip=skip, limit=limit, after=after)
+    set_next_cursor(response, next_cursor)
+    return products
 
 @app.get("/product/get/{product_id}", response_model=schemas.Products, tags=["Products"])
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = crud.get_product_by_id(db=db, product_id=product_id)
+def get_product(product_id: int):
+    product = reference_data.product(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
@@ -760,8 +939,8 @@ def create_discount_condition(discount_condition: schemas.DiscountConditionCreat
     return crud.create_discount_condition(db=db, discount_condition=discount_condition)
 
 @app.get("/discount_conditions/get", response_model=List[schemas.DiscountCondition], tags=["Discount Conditions"])
-def get_discount_conditions(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_discount_conditions(db=db, skip=skip, limit=limit)
+def get_discount_conditions(skip: int = 0, limit: int = 10):
+    return reference_data.discount_conditions()[skip:skip + limit]
 
 @app.put("/discount_condition/put/{discount_condition_id}", response_model=schemas.DiscountCondition, tags=["Discount Conditions"])
 def update_discount_condition(discount_condition_id: int, discount_condition_update: schemas.DiscountConditionBase, db: Session = Depends(get_db)):
@@ -784,8 +963,10 @@ def create_market_shipment(market_shipment: schemas.MarketShipmentCreate, db: Se
     return crud.create_market_shipment(db=db, market_shipment=market_shipment)
 
 @app.get("/market_shipments/get", response_model=List[schemas.MarketShipment], tags=["MarketShipment"])
-def get_market_shipments(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_market_shipments(db=db, skip=skip, limit=limit)
+def get_market_shipments(response: Response, skip: int = 0, limit: int = Query(10, ge=1, le=1000), after: str = None, db: Session = Depends(get_db)):
+    market_shipments, next_cursor = crud.get_market_shipments(db=db, skip=skip, limit=limit, after=after)
+    set_next_cursor(response, next_cursor)
+    return market_shipments
 
 @app.get("/market_shipment/get/{market_shipment_id}", response_model=schemas.MarketShipment, tags=["MarketShipment"])
 def get_market_shipment(market_shipment_id: int, db: Session = Depends(get_db)):
@@ -1000,9 +1181,12 @@ def read_centra_cities(db: Session = Depends(get_db)):
 
 
 @app.get("/items/", response_model=Dict[str, List[Union[schemas.SimpleFlour, schemas.SimpleDryLeaves]]])
-def read_items(item_type: str, limit: int = 100, db: Session = Depends(get_db)):
+def read_items(response: Response, item_type: str, limit: int = Query(100, ge=1, le=1000), after: str = None, status: str = None,
+               expires_after: datetime = None, expires_before: datetime = None, db: Session = Depends(get_db)):
     try:
-        items = crud.get_items(db, item_type=item_type, limit=limit)
+        items, next_cursor = crud.get_items(db, item_type=item_type, limit=limit, after=after, status=status,
+                                            expires_after=expires_after, expires_before=expires_before)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, next_cursor)
     return items
@@ -0,0 +1,327 @@
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import event, text
+import crud
+import migrate
+import models
+from database import SessionLocal, engine
+
+
+def run_migrations(args):
+    migrate.run_migrations(engine)
+
+
+def rebuild_production_totals(args):
+    migrate.run_migrations(engine)
+    db = SessionLocal()
+    try:
+        count = crud.rebuild_production_totals(db)
+    finally:
+        db.close()
+    print(f"Rebuilt production totals for {count} centra")
+
+
+def rebuild_production_daily(args):
+    migrate.run_migrations(engine)
+    db = SessionLocal()
+    try:
+        count = crud.rebuild_production_daily(db)
+    finally:
+        db.close()
+    print(f"Rebuilt {count} daily production rows")
+
+
+def issue_check_in_tokens(args):
+    migrate.run_migrations(engine)
+    db = SessionLocal()
+    try:
+        count = crud.issue_check_in_tokens(db)
+    finally:
+        db.close()
+    print(f"Issued check-in tokens for {count} shipments")
+
+
+def capture_statements(call):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def explain_indexes(args):
+    db = SessionLocal()
+    # expire_stock commits per batch, which would end the transaction holding SET LOCAL below,
+    # so it runs on its own session; its statements are captured all the same
+    sweep_db = SessionLocal()
+    failures = 0
+    try:
+        user_id = db.query(models.User.UserID).limit(1).scalar() or str(uuid.uuid4())
+        shipment_id = db.query(models.Shipment.ShipmentID).limit(1).scalar() or 0
+        # name -> (call, index its plan must use, or None for any index)
+        checks = {
+            "get_wet_leaves_by_user_id": (lambda: crud.get_wet_leaves_by_user_id(db, user_id), None),
+            "sum_weight_wet_leaves_by_user_today": (lambda: crud.sum_weight_wet_leaves_by_user_today(db, user_id), None),
+            "get_dry_leaves_by_user_id": (lambda: crud.get_dry_leaves_by_user_id(db, user_id), None),
+            "get_flour_by_user_id": (lambda: crud.get_flour_by_user_id(db, user_id), None),
+            "get_shipment_by_user_id": (lambda: crud.get_shipment_by_user_id(db, user_id), None),
+            "get_flours_by_shipment_id": (lambda: crud.get_flours_by_shipment_id(db, shipment_id), None),
+            "get_shipment_ids_with_date_but_no_checkin": (lambda: crud.get_shipment_ids_with_date_but_no_checkin(db), None),
+            "get_shipment_ids_by_check_in_token": (lambda: crud.get_shipment_ids_by_check_in_token(db, "0" * 32), None),
+            # A sweep as of 1970 matches nothing, so the check changes no rows
+            "expire_stock": (lambda: crud.expire_stock(sweep_db, now=datetime(1970, 1, 1)), "_Expiration_awaiting"),
+            # Awaiting would be served by the partial Expiration indexes instead
+            "get_wet_leaves (status)": (lambda: crud.get_wet_leaves(db, status=crud.EXPIRED_STATUS), "ix_wet_leaves_Status"),
+            "get_dry_leaves (status)": (lambda: crud.get_dry_leaves(db, status=crud.EXPIRED_STATUS), "ix_dry_leaves_Status"),
+            "get_flour (status)": (lambda: crud.get_flour(db, status=crud.EXPIRED_STATUS), "ix_flour_Status"),
+            "get_items (status)": (lambda: crud.get_items(db, "flour", status=crud.EXPIRED_STATUS), "ix_flour_Status"),
+            # No crud read filters market shipments by party; these are the lookups Postgres runs
+            # on market_shipment when a user is deleted or their UserID changes
+            "market_shipment by CentraID": (
+                lambda: db.query(models.MarketShipment.MarketShipmentID).filter(models.MarketShipment.CentraID == user_id).all(),
+                "ix_market_shipment_CentraID",
+            ),
+            "market_shipment by CustomerID": (
+                lambda: db.query(models.MarketShipment.MarketShipmentID).filter(models.MarketShipment.CustomerID == user_id).all(),
+                "ix_market_shipment_CustomerID",
+            ),
+        }
+
+        # Small tables make the planner prefer sequential scans, so turn them off to
+        # check that an index is usable at all rather than whether it wins today
+        db.execute(text("SET LOCAL enable_seqscan = off"))
+        for name, (check, index) in checks.items():
+            for statement, parameters in capture_statements(check):
+                # Skip session setup such as the per-transaction SET LOCAL statement_timeout
+                if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "WITH")):
+                    continue
+                plan = "\n".join(row[0] for row in db.connection().exec_driver_sql("EXPLAIN " + statement, parameters))
+                if "Seq Scan" in plan:
+                    failures += 1
+                    print(f"SEQ SCAN  {name}\n{plan}\n")
+                elif index is not None and index not in plan:
+                    failures += 1
+                    print(f"NO {index}  {name}\n{plan}\n")
+                else:
+                    print(f"index     {name}")
+    finally:
+        db.rollback()
+        db.close()
+        sweep_db.close()
+    sys.exit(1 if failures else 0)
+
+
+# Upper bounds on round-trips per call; a lazy load sneaking back into a loop pushes the
+# count up with the number of rows and fails the check
+QUERY_BUDGETS = {
+    "get_shipment": 2,
+    "get_shipment_by_user_id": 2,
+    "get_shipment_by_id": 2,
+}
+
+
+def check_query_counts(args):
+    db = SessionLocal()
+    failures = 0
+    try:
+        user_id = db.query(models.User.UserID).join(models.Shipment, models.Shipment.UserID == models.User.UserID).limit(1).scalar() or str(uuid.uuid4())
+        shipment_id = db.query(models.Shipment.ShipmentID).limit(1).scalar()
+        checks = {
+            "get_shipment": lambda: crud.get_shipment(db, limit=100),
+            "get_shipment_by_user_id": lambda: crud.get_shipment_by_user_id(db, user_id),
+        }
+        if shipment_id is not None:
+            checks["get_shipment_by_id"] = lambda: crud.get_shipment_by_id(db, shipment_id)
+
+        for name, check in checks.items():
+            db.expire_all()
+            count = len(capture_statements(check))
+            budget = QUERY_BUDGETS[name]
+            if count > budget:
+                failures += 1
+                print(f"TOO MANY  {name}: {count} queries (budget {budget})")
+            else:
+                print(f"ok        {name}: {count} queries")
+    finally:
+        db.rollback()
+        db.close()
+    sys.exit(1 if failures else 0)
+
+
+# Cheap endpoints, where per-request overhead rather than the query dominates
+BENCH_REQUESTS = [
+    ("OPTIONS", "/roles/get", [(b"origin", b"http://localhost:5173"), (b"access-control-request-method", b"GET")]),
+    ("GET", "/roles/get", []),
+    ("GET", "/statistics/all", []),
+    ("GET", "/wetleaves/get?limit=10", []),
+]
+
+
+async def call_app(app, method, target, headers):
+    # Drives the ASGI app in-process so the numbers leave out the network and the server
+    path, _, query = target.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"bench")] + headers,
+        "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    status = None
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        # Like a server: the (empty) body once, then nothing until the response is done
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body", False):
+            finished.set()
+
+    await app(scope, receive, send)
+    return status
+
+
+def bench_requests(args):
+    from main import app
+
+    checkouts = 0
+
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        nonlocal checkouts
+        checkouts += 1
+
+    async def run():
+        nonlocal checkouts
+        event.listen(engine, "checkout", count_checkout)
+        try:
+            for method, target, headers in BENCH_REQUESTS:
+                for _ in range(args.warmup):
+                    await call_app(app, method, target, headers)
+                checkouts = 0
+                timings = []
+                for _ in range(args.requests):
+                    start = time.perf_counter()
+                    status = await call_app(app, method, target, headers)
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                p50 = statistics.median(timings)
+                p95 = timings[int(len(timings) * 0.95) - 1]
+                print(f"{method:7} {target:28} {status}  p50 {p50:7.3f} ms  p95 {p95:7.3f} ms  checkouts/request {checkouts / args.requests:.2f}")
+        finally:
+            event.remove(engine, "checkout", count_checkout)
+
+    asyncio.run(run())
+
+
+def bench_reads(args):
+    import main
+    from database import async_engine, async_pool_metrics, pool_metrics
+
+    if async_engine is None:
+        print("bench-reads compares both read paths; unset DB_ASYNC_READS=false first")
+        sys.exit(1)
+    db = SessionLocal()
+    try:
+        user_id = db.query(models.WetLeaves.UserID).limit(1).scalar()
+    finally:
+        db.close()
+    if user_id is None:
+        print("No wet leaves to read; add some data first")
+        sys.exit(1)
+    targets = [f"/centra/{user_id}/dashboard", "/wetleaves/get?limit=100"]
+
+    async def load(target):
+        semaphore = asyncio.Semaphore(args.concurrency)
+        timings = []
+        statuses = Counter()
+        peak_threads = threading.active_count()
+        running = True
+
+        async def request():
+            async with semaphore:
+                start = time.perf_counter()
+                statuses[await call_app(main.app, "GET", target, [])] += 1
+                timings.append((time.perf_counter() - start) * 1000)
+
+        async def sample_threads():
+            nonlocal peak_threads
+            while running:
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.005)
+
+        sampler = asyncio.create_task(sample_threads())
+        start = time.perf_counter()
+        await asyncio.gather(*(request() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - start
+        running = False
+        await sampler
+        timings.sort()
+        return elapsed, timings, statuses, peak_threads
+
+    async def run():
+        # One event loop for both modes: asyncpg connections belong to the loop that opened them.
+        # Async goes first, since the thread pool keeps its idle threads once sync has grown it.
+        try:
+            for mode in ("async", "sync"):
+                for target in targets:
+                    main.ASYNC_READS = mode == "async"
+                    metrics = async_pool_metrics if main.ASYNC_READS else pool_metrics
+                    await load(target)  # warm the pool and the caches
+                    before = metrics.snapshot()
+                    elapsed, timings, statuses, peak_threads = await load(target)
+                    after = metrics.snapshot()
+                    print(
+                        f"{mode:5} {target[:32]:32}  {args.requests / elapsed:7.0f} req/s"
+                        f"  p50 {statistics.median(timings):7.1f} ms  p95 {timings[int(len(timings) * 0.95) - 1]:7.1f} ms"
+                        f"  peak threads {peak_threads:3}  checkouts {after['checkouts'] - before['checkouts']:5}"
+                        f"  waits {after['waits'] - before['waits']:4}  statuses {dict(statuses)}"
+                    )
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Leafty maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("migrate", help="Apply pending migrations from migrations/").set_defaults(func=run_migrations)
+    subparsers.add_parser("explain-indexes", help="EXPLAIN the hot crud queries and fail if any needs a sequential scan").set_defaults(func=explain_indexes)
+    subparsers.add_parser("check-query-counts", help="Fail if the shipment listings issue more queries than their budget").set_defaults(func=check_query_counts)
+    bench = subparsers.add_parser("bench-requests", help="Time cheap endpoints in-process and count pool checkouts per request")
+    bench.add_argument("--requests", type=int, default=500)
+    bench.add_argument("--warmup", type=int, default=50)
+    bench.set_defaults(func=bench_requests)
+    bench = subparsers.add_parser("bench-reads", help="Compare the sync and async read paths under concurrent load")
+    bench.add_argument("--requests", type=int, default=2000)
+    bench.add_argument("--concurrency", type=int, default=500)
+    bench.set_defaults(func=bench_reads)
+    subparsers.add_parser("issue-check-in-tokens", help="Issue harbor check-in tokens for shipments that have none").set_defaults(func=issue_check_in_tokens)
+    subparsers.add_parser("rebuild-production-totals", help="Recompute the production_totals table from scratch").set_defaults(func=rebuild_production_totals)
+    subparsers.add_parser("rebuild-production-daily", help="Recompute the production_daily rollup from scratch").set_defaults(func=rebuild_production_daily)
+
+    args = parser.parse_args()
+    args.func(args)
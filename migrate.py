@@ -0,0 +1,27 @@
+import os
+from sqlalchemy import text
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# Arbitrary key so that workers starting together apply migrations one at a time
+MIGRATION_LOCK_ID = 4113
+
+def run_migrations(engine):
+    """Apply every migrations/*.sql file that is not yet recorded in schema_migrations, in filename order."""
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version VARCHAR(255) PRIMARY KEY, "
+            "applied_at TIMESTAMP NOT NULL DEFAULT now())"
+        ))
+        applied = set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+        for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+            version, extension = os.path.splitext(filename)
+            if extension != ".sql" or version in applied:
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, filename)) as migration_file:
+                connection.exec_driver_sql(migration_file.read())
+            connection.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {"version": version})
+            print(f"Applied migration {version}")
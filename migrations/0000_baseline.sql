@@ -0,0 +1,211 @@
+-- Baseline schema, previously created by Base.metadata.create_all at startup.
+-- Every statement is IF NOT EXISTS, so databases created before migrations existed
+-- simply record this version as applied.
+
+CREATE TABLE IF NOT EXISTS admin_settings (
+	"AdminSettingsID" SERIAL NOT NULL,
+	"AdminFeeValue" FLOAT NOT NULL,
+	PRIMARY KEY ("AdminSettingsID")
+);
+
+CREATE TABLE IF NOT EXISTS couriers (
+	"CourierID" SERIAL NOT NULL,
+	"CourierName" VARCHAR(50) NOT NULL,
+	PRIMARY KEY ("CourierID")
+);
+
+CREATE TABLE IF NOT EXISTS discount_condition (
+	"DiscountConditionID" SERIAL NOT NULL,
+	"DiscountRate" INTEGER,
+	"ExpDayLeft" INTEGER,
+	PRIMARY KEY ("DiscountConditionID")
+);
+
+CREATE TABLE IF NOT EXISTS locations (
+	"LocationID" SERIAL NOT NULL,
+	"LocationAddress" VARCHAR(100),
+	"Latitude" FLOAT NOT NULL,
+	"Longitude" FLOAT NOT NULL,
+	PRIMARY KEY ("LocationID")
+);
+
+CREATE TABLE IF NOT EXISTS otp (
+	email VARCHAR NOT NULL,
+	otp_code VARCHAR NOT NULL,
+	expires_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	PRIMARY KEY (email)
+);
+CREATE INDEX IF NOT EXISTS ix_otp_email ON otp (email);
+
+CREATE TABLE IF NOT EXISTS production_daily (
+	"UserID" VARCHAR(36) NOT NULL,
+	"Day" DATE NOT NULL,
+	"Stage" VARCHAR(20) NOT NULL,
+	"Total" FLOAT NOT NULL,
+	PRIMARY KEY ("UserID", "Day", "Stage")
+);
+
+CREATE TABLE IF NOT EXISTS production_totals (
+	"UserID" VARCHAR(36) NOT NULL,
+	"WetLeavesWeight" FLOAT NOT NULL,
+	"DryLeavesWeight" FLOAT NOT NULL,
+	"FlourWeight" FLOAT NOT NULL,
+	"ShipmentQuantity" INTEGER NOT NULL,
+	PRIMARY KEY ("UserID")
+);
+
+CREATE TABLE IF NOT EXISTS products_templates (
+	"ProductID" SERIAL NOT NULL,
+	"ProductName" VARCHAR(100) NOT NULL,
+	PRIMARY KEY ("ProductID")
+);
+
+CREATE TABLE IF NOT EXISTS roles (
+	"RoleID" SERIAL NOT NULL,
+	"RoleName" VARCHAR(50),
+	PRIMARY KEY ("RoleID")
+);
+
+CREATE TABLE IF NOT EXISTS users (
+	"UserID" VARCHAR(36) NOT NULL,
+	"Username" VARCHAR(50),
+	"Email" VARCHAR(100),
+	"PhoneNumber" BIGINT,
+	"Password" VARCHAR(100),
+	"RoleID" INTEGER,
+	PRIMARY KEY ("UserID"),
+	UNIQUE ("Email"),
+	FOREIGN KEY("RoleID") REFERENCES roles ("RoleID")
+);
+
+CREATE TABLE IF NOT EXISTS centra_initial_prices (
+	"InitialPriceID" SERIAL NOT NULL,
+	"UserID" VARCHAR(36),
+	"ProductID" INTEGER,
+	"InitialPrice" FLOAT NOT NULL,
+	PRIMARY KEY ("InitialPriceID"),
+	FOREIGN KEY("UserID") REFERENCES users ("UserID"),
+	FOREIGN KEY("ProductID") REFERENCES products_templates ("ProductID")
+);
+
+CREATE TABLE IF NOT EXISTS centra_setting_details (
+	"SettingDetailID" SERIAL NOT NULL,
+	"UserID" VARCHAR(36),
+	"ProductID" INTEGER,
+	"DiscountConditionID" INTEGER,
+	PRIMARY KEY ("SettingDetailID"),
+	FOREIGN KEY("UserID") REFERENCES users ("UserID"),
+	FOREIGN KEY("ProductID") REFERENCES products_templates ("ProductID"),
+	FOREIGN KEY("DiscountConditionID") REFERENCES discount_condition ("DiscountConditionID")
+);
+
+CREATE TABLE IF NOT EXISTS indonesian_cities (
+	user_id VARCHAR NOT NULL,
+	name VARCHAR,
+	lat FLOAT,
+	lng FLOAT,
+	PRIMARY KEY (user_id),
+	FOREIGN KEY(user_id) REFERENCES users ("UserID")
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+	session_id VARCHAR(36) NOT NULL,
+	user_id VARCHAR(36),
+	user_role INTEGER,
+	user_email VARCHAR(36),
+	PRIMARY KEY (session_id),
+	UNIQUE (session_id),
+	FOREIGN KEY(user_id) REFERENCES users ("UserID"),
+	FOREIGN KEY(user_role) REFERENCES roles ("RoleID")
+);
+
+CREATE TABLE IF NOT EXISTS shipments (
+	"ShipmentID" SERIAL NOT NULL,
+	"CourierID" INTEGER,
+	"UserID" VARCHAR(36),
+	"ShipmentQuantity" INTEGER,
+	"ShipmentDate" TIMESTAMP WITHOUT TIME ZONE,
+	"Check_in_Date" TIMESTAMP WITHOUT TIME ZONE,
+	"Check_in_Quantity" INTEGER,
+	"Harbor_Reception_File" BOOLEAN,
+	"Rescalled_Weight" FLOAT,
+	"Rescalled_Date" TIMESTAMP WITHOUT TIME ZONE,
+	"Centra_Reception_File" BOOLEAN,
+	PRIMARY KEY ("ShipmentID"),
+	FOREIGN KEY("CourierID") REFERENCES couriers ("CourierID"),
+	FOREIGN KEY("UserID") REFERENCES users ("UserID")
+);
+
+CREATE TABLE IF NOT EXISTS wet_leaves (
+	"WetLeavesID" SERIAL NOT NULL,
+	"UserID" VARCHAR(36),
+	"Weight" FLOAT,
+	"ReceivedTime" TIMESTAMP WITHOUT TIME ZONE,
+	"Expiration" TIMESTAMP WITHOUT TIME ZONE,
+	"Status" VARCHAR(50),
+	PRIMARY KEY ("WetLeavesID"),
+	FOREIGN KEY("UserID") REFERENCES users ("UserID")
+);
+
+CREATE TABLE IF NOT EXISTS dry_leaves (
+	"DryLeavesID" SERIAL NOT NULL,
+	"UserID" VARCHAR(36),
+	"WetLeavesID" INTEGER,
+	"Processed_Weight" FLOAT,
+	"ProcessedTime" TIMESTAMP WITHOUT TIME ZONE,
+	"Expiration" TIMESTAMP WITHOUT TIME ZONE,
+	"Status" VARCHAR(50),
+	PRIMARY KEY ("DryLeavesID"),
+	FOREIGN KEY("UserID") REFERENCES users ("UserID"),
+	FOREIGN KEY("WetLeavesID") REFERENCES wet_leaves ("WetLeavesID")
+);
+
+CREATE TABLE IF NOT EXISTS flour (
+	"FlourID" SERIAL NOT NULL,
+	"DryLeavesID" INTEGER,
+	"UserID" VARCHAR(36),
+	"Flour_Weight" FLOAT,
+	"ProcessedTime" TIMESTAMP WITHOUT TIME ZONE,
+	"Expiration" TIMESTAMP WITHOUT TIME ZONE,
+	"Status" VARCHAR(50),
+	PRIMARY KEY ("FlourID"),
+	FOREIGN KEY("DryLeavesID") REFERENCES dry_leaves ("DryLeavesID"),
+	FOREIGN KEY("UserID") REFERENCES users ("UserID")
+);
+
+CREATE TABLE IF NOT EXISTS market_shipment (
+	"MarketShipmentID" SERIAL NOT NULL,
+	"CentraID" VARCHAR(36),
+	"CustomerID" VARCHAR(36),
+	"DryLeavesID" INTEGER,
+	"PowderID" INTEGER,
+	status VARCHAR,
+	PRIMARY KEY ("MarketShipmentID"),
+	FOREIGN KEY("CentraID") REFERENCES users ("UserID"),
+	FOREIGN KEY("CustomerID") REFERENCES users ("UserID"),
+	FOREIGN KEY("DryLeavesID") REFERENCES dry_leaves ("DryLeavesID"),
+	FOREIGN KEY("PowderID") REFERENCES flour ("FlourID")
+);
+
+CREATE TABLE IF NOT EXISTS shipment_flour_association (
+	shipment_id INTEGER,
+	flour_id INTEGER,
+	FOREIGN KEY(shipment_id) REFERENCES shipments ("ShipmentID"),
+	FOREIGN KEY(flour_id) REFERENCES flour ("FlourID")
+);
+
+CREATE TABLE IF NOT EXISTS sub_transaction (
+	"SubTransactionID" SERIAL NOT NULL,
+	"MarketShipmentID" INTEGER,
+	status VARCHAR,
+	PRIMARY KEY ("SubTransactionID"),
+	FOREIGN KEY("MarketShipmentID") REFERENCES market_shipment ("MarketShipmentID")
+);
+
+CREATE TABLE IF NOT EXISTS transaction (
+	"TransactionID" SERIAL NOT NULL,
+	"SubTransactionID" INTEGER,
+	status VARCHAR,
+	PRIMARY KEY ("TransactionID"),
+	FOREIGN KEY("SubTransactionID") REFERENCES sub_transaction ("SubTransactionID")
+);
@@ -0,0 +1,3 @@
+-- Dry leaves and flour record when they were produced, so the daily rollup can bucket them
+ALTER TABLE dry_leaves ADD COLUMN IF NOT EXISTS "ProcessedTime" TIMESTAMP WITHOUT TIME ZONE;
+ALTER TABLE flour ADD COLUMN IF NOT EXISTS "ProcessedTime" TIMESTAMP WITHOUT TIME ZONE;
@@ -0,0 +1,9 @@
+-- Per-user lookups compare "UserID" directly against a normalised UUID string
+-- (crud.normalize_user_id) instead of casting every row to uuid, so plain btree
+-- indexes on the String(36) columns turn those scans into index seeks.
+-- Stored IDs are already canonical: users."UserID" comes from str(uuid.uuid4())
+-- and the other columns reference it through foreign keys.
+CREATE INDEX IF NOT EXISTS "ix_wet_leaves_UserID" ON wet_leaves ("UserID");
+CREATE INDEX IF NOT EXISTS "ix_dry_leaves_UserID" ON dry_leaves ("UserID");
+CREATE INDEX IF NOT EXISTS "ix_flour_UserID" ON flour ("UserID");
+CREATE INDEX IF NOT EXISTS "ix_shipments_UserID" ON shipments ("UserID");
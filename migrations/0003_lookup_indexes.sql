@@ -0,0 +1,23 @@
+-- Foreign keys used to walk the supply chain and to join shipments to couriers
+CREATE INDEX IF NOT EXISTS "ix_dry_leaves_WetLeavesID" ON dry_leaves ("WetLeavesID");
+CREATE INDEX IF NOT EXISTS "ix_flour_DryLeavesID" ON flour ("DryLeavesID");
+CREATE INDEX IF NOT EXISTS "ix_shipments_CourierID" ON shipments ("CourierID");
+
+-- shipment.flours loads by shipment_id; the reverse lookup (which shipments hold a flour) by flour_id
+CREATE INDEX IF NOT EXISTS ix_shipment_flour_association_shipment_id_flour_id ON shipment_flour_association (shipment_id, flour_id);
+CREATE INDEX IF NOT EXISTS ix_shipment_flour_association_flour_id ON shipment_flour_association (flour_id);
+
+CREATE INDEX IF NOT EXISTS "ix_market_shipment_CentraID" ON market_shipment ("CentraID");
+CREATE INDEX IF NOT EXISTS "ix_market_shipment_CustomerID" ON market_shipment ("CustomerID");
+
+CREATE INDEX IF NOT EXISTS "ix_wet_leaves_Status" ON wet_leaves ("Status");
+CREATE INDEX IF NOT EXISTS "ix_dry_leaves_Status" ON dry_leaves ("Status");
+CREATE INDEX IF NOT EXISTS "ix_flour_Status" ON flour ("Status");
+
+-- Only stock still awaiting processing can expire, so the expiry range scans stay small
+CREATE INDEX IF NOT EXISTS "ix_wet_leaves_Expiration_awaiting" ON wet_leaves ("Expiration") WHERE "Status" = 'Awaiting';
+CREATE INDEX IF NOT EXISTS "ix_dry_leaves_Expiration_awaiting" ON dry_leaves ("Expiration") WHERE "Status" = 'Awaiting';
+CREATE INDEX IF NOT EXISTS "ix_flour_Expiration_awaiting" ON flour ("Expiration") WHERE "Status" = 'Awaiting';
+
+-- Shipments sent but not yet checked in at the harbor
+CREATE INDEX IF NOT EXISTS ix_shipments_awaiting_check_in ON shipments ("ShipmentID") WHERE "ShipmentDate" IS NOT NULL AND "Check_in_Date" IS NULL;
@@ -0,0 +1,5 @@
+-- Time-ordered keyset pagination seeks on (time, id) and reads the page straight off the index
+CREATE INDEX IF NOT EXISTS "ix_wet_leaves_ReceivedTime_WetLeavesID" ON wet_leaves ("ReceivedTime", "WetLeavesID");
+CREATE INDEX IF NOT EXISTS "ix_dry_leaves_ProcessedTime_DryLeavesID" ON dry_leaves ("ProcessedTime", "DryLeavesID");
+CREATE INDEX IF NOT EXISTS "ix_flour_ProcessedTime_FlourID" ON flour ("ProcessedTime", "FlourID");
+CREATE INDEX IF NOT EXISTS "ix_shipments_ShipmentDate_ShipmentID" ON shipments ("ShipmentDate", "ShipmentID");
@@ -0,0 +1,6 @@
+-- Sessions now live in the database for every worker, so each one needs an end
+ALTER TABLE sessions ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP WITHOUT TIME ZONE;
+UPDATE sessions SET expires_at = LOCALTIMESTAMP + INTERVAL '7 days' WHERE expires_at IS NULL;
+
+-- Match users."Email"; longer addresses could not start a session
+ALTER TABLE sessions ALTER COLUMN user_email TYPE VARCHAR(100);
@@ -0,0 +1,2 @@
+-- The session sweeper deletes by expires_at range
+CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions (expires_at);
@@ -0,0 +1,4 @@
+-- Harbor check-in codes; resolving a scanned code is one lookup on the unique index.
+-- Existing shipments get theirs from `python manage.py issue-check-in-tokens`, since codes are generated in the app.
+ALTER TABLE shipments ADD COLUMN IF NOT EXISTS "CheckInToken" VARCHAR(64);
+CREATE UNIQUE INDEX IF NOT EXISTS "ix_shipments_CheckInToken" ON shipments ("CheckInToken");
@@ -0,0 +1,8 @@
+-- Single-row counter bumped by every write to roles, couriers, products, discount conditions
+-- and admin settings; each worker reloads its in-memory copy when the counter moves.
+CREATE TABLE IF NOT EXISTS reference_data_version (
+	id INTEGER NOT NULL,
+	version BIGINT NOT NULL,
+	PRIMARY KEY (id)
+);
+INSERT INTO reference_data_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,32 @@
+-- production_totals was created empty, and the first write after deploy upserts only its own delta,
+-- so recompute every counter from the source tables. The lock holds back writers' upserts until
+-- the new totals are committed; their deltas then land on top of them.
+LOCK TABLE production_totals IN EXCLUSIVE MODE;
+DELETE FROM production_totals;
+
+INSERT INTO production_totals ("UserID", "WetLeavesWeight", "DryLeavesWeight", "FlourWeight", "ShipmentQuantity")
+SELECT "UserID",
+	COALESCE(SUM(wet_leaves), 0),
+	COALESCE(SUM(dry_leaves), 0),
+	COALESCE(SUM(flour), 0),
+	COALESCE(SUM(shipment_quantity), 0)
+FROM (
+	SELECT "UserID", "Weight" AS wet_leaves, 0.0 AS dry_leaves, 0.0 AS flour, 0 AS shipment_quantity FROM wet_leaves
+	UNION ALL
+	SELECT "UserID", 0.0, "Processed_Weight", 0.0, 0 FROM dry_leaves
+	UNION ALL
+	SELECT "UserID", 0.0, 0.0, "Flour_Weight", 0 FROM flour
+	UNION ALL
+	SELECT "UserID", 0.0, 0.0, 0.0, "ShipmentQuantity" FROM shipments
+) AS production
+WHERE "UserID" IS NOT NULL
+GROUP BY "UserID";
+
+-- Same definition as crud.rebuild_production_totals: the global row sums the centra rows
+INSERT INTO production_totals ("UserID", "WetLeavesWeight", "DryLeavesWeight", "FlourWeight", "ShipmentQuantity")
+SELECT 'global',
+	COALESCE(SUM("WetLeavesWeight"), 0),
+	COALESCE(SUM("DryLeavesWeight"), 0),
+	COALESCE(SUM("FlourWeight"), 0),
+	COALESCE(SUM("ShipmentQuantity"), 0)
+FROM production_totals;
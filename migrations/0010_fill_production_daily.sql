@@ -0,0 +1,32 @@
+-- Rows produced before ProcessedTime existed take the time their input was received: dry leaves
+-- from their wet leaves, flour from its (possibly just backfilled) dry leaves. Rows without a
+-- parent keep NULL and stay out of the daily series.
+UPDATE dry_leaves SET "ProcessedTime" = wet_leaves."ReceivedTime"
+FROM wet_leaves
+WHERE dry_leaves."ProcessedTime" IS NULL AND wet_leaves."WetLeavesID" = dry_leaves."WetLeavesID";
+
+UPDATE flour SET "ProcessedTime" = dry_leaves."ProcessedTime"
+FROM dry_leaves
+WHERE flour."ProcessedTime" IS NULL AND dry_leaves."DryLeavesID" = flour."DryLeavesID";
+
+-- Then rebuild the rollup the same way crud.rebuild_production_daily does, under a lock so
+-- concurrent writers' upserts land on top of it
+LOCK TABLE production_daily IN EXCLUSIVE MODE;
+DELETE FROM production_daily;
+
+INSERT INTO production_daily ("UserID", "Day", "Stage", "Total")
+SELECT "UserID", CAST("ReceivedTime" AS DATE), 'wet_leaves', COALESCE(SUM("Weight"), 0)
+FROM wet_leaves WHERE "UserID" IS NOT NULL AND "ReceivedTime" IS NOT NULL
+GROUP BY "UserID", CAST("ReceivedTime" AS DATE)
+UNION ALL
+SELECT "UserID", CAST("ProcessedTime" AS DATE), 'dry_leaves', COALESCE(SUM("Processed_Weight"), 0)
+FROM dry_leaves WHERE "UserID" IS NOT NULL AND "ProcessedTime" IS NOT NULL
+GROUP BY "UserID", CAST("ProcessedTime" AS DATE)
+UNION ALL
+SELECT "UserID", CAST("ProcessedTime" AS DATE), 'flour', COALESCE(SUM("Flour_Weight"), 0)
+FROM flour WHERE "UserID" IS NOT NULL AND "ProcessedTime" IS NOT NULL
+GROUP BY "UserID", CAST("ProcessedTime" AS DATE)
+UNION ALL
+SELECT "UserID", CAST("ShipmentDate" AS DATE), 'shipment', COALESCE(SUM("ShipmentQuantity"), 0)
+FROM shipments WHERE "UserID" IS NOT NULL AND "ShipmentDate" IS NOT NULL
+GROUP BY "UserID", CAST("ShipmentDate" AS DATE);
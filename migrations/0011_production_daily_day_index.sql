@@ -0,0 +1,2 @@
+-- The global timeseries filters on "Day" alone, which the (UserID, Day, Stage) key cannot seek on
+CREATE INDEX IF NOT EXISTS "ix_production_daily_Day_Stage" ON production_daily ("Day", "Stage");
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Float, DateTime, Enum, BigInteger, Table, func
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Float, DateTime, Date, Enum, BigInteger, Table, Index, func, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy import Column, Integer, String, ForeignKey, UUID, Boolean
@@ -9,7 +9,8 @@ Base = declarative_base()
 shipment_flour_association = Table(
     'shipment_flour_association', Base.metadata,
     Column('shipment_id', Integer, ForeignKey('shipments.ShipmentID')),
-    Column('flour_id', Integer, ForeignKey('flour.FlourID'))
+    Column('flour_id', Integer, ForeignKey('flour.FlourID'), index=True),
+    Index('ix_shipment_flour_association_shipment_id_flour_id', 'shipment_id', 'flour_id')
 )
 
 class SessionData(Base):
@@ -18,7 +19,8 @@ class SessionData(Base):
     session_id = Column(String(36), unique=True, primary_key=True)
     user_id = Column(String(36), ForeignKey('users.UserID'))
     user_role = Column(Integer, ForeignKey('roles.RoleID'))
-    user_email = Column(String(36))
+    user_email = Column(String(100))
+    expires_at = Column(DateTime, index=True)
 
 class OTP(Base):
     __tablename__ = "otp"
@@ -64,38 +66,55 @@ class WetLeaves(Base):
     __tablename__ = "wet_leaves"
 
     WetLeavesID = Column(Integer, primary_key=True, autoincrement=True)
-    UserID = Column(String(36), ForeignKey("users.UserID"))
+    UserID = Column(String(36), ForeignKey("users.UserID"), index=True)
     Weight = Column(Float)
     ReceivedTime = Column(DateTime)
     Expiration = Column(DateTime)
-    Status = Column(String(50), default="Awaiting")
+    Status = Column(String(50), default="Awaiting", index=True)
+
+    __table_args__ = (
+        Index("ix_wet_leaves_Expiration_awaiting", "Expiration", postgresql_where=text("\"Status\" = 'Awaiting'")),
+        Index("ix_wet_leaves_ReceivedTime_WetLeavesID", "ReceivedTime", "WetLeavesID"),
+    )
 
 class DryLeaves(Base):
     __tablename__ = "dry_leaves"
 
     DryLeavesID = Column(Integer, primary_key=True, autoincrement=True)
-    UserID = Column(String(36), ForeignKey("users.UserID"))
-    WetLeavesID = Column(Integer, ForeignKey("wet_leaves.WetLeavesID"))
+    UserID = Column(String(36), ForeignKey("users.UserID"), index=True)
+    WetLeavesID = Column(Integer, ForeignKey("wet_leaves.WetLeavesID"), index=True)
     Processed_Weight = Column(Float)
+    ProcessedTime = Column(DateTime, nullable=True)
     Expiration = Column(DateTime, nullable=True)
-    Status = Column(String(50), default="Awaiting")
+    Status = Column(String(50), default="Awaiting", index=True)
+
+    __table_args__ = (
+        Index("ix_dry_leaves_Expiration_awaiting", "Expiration", postgresql_where=text("\"Status\" = 'Awaiting'")),
+        Index("ix_dry_leaves_ProcessedTime_DryLeavesID", "ProcessedTime", "DryLeavesID"),
+    )
 
 class Flour(Base):
     __tablename__ = "flour"
 
     FlourID = Column(Integer, primary_key=True, autoincrement=True)
-    DryLeavesID = Column(Integer, ForeignKey("dry_leaves.DryLeavesID"))
-    UserID = Column(String(36), ForeignKey("users.UserID"))
+    DryLeavesID = Column(Integer, ForeignKey("dry_leaves.DryLeavesID"), index=True)
+    UserID = Column(String(36), ForeignKey("users.UserID"), index=True)
     Flour_Weight = Column(Float)
+    ProcessedTime = Column(DateTime, nullable=True)
     Expiration = Column(DateTime, nullable=True)
-    Status = Column(String(50), default="Awaiting")
+    Status = Column(String(50), default="Awaiting", index=True)
+
+    __table_args__ = (
+        Index("ix_flour_Expiration_awaiting", "Expiration", postgresql_where=text("\"Status\" = 'Awaiting'")),
+        Index("ix_flour_ProcessedTime_FlourID", "ProcessedTime", "FlourID"),
+    )
 
 class Shipment(Base):
     __tablename__ = "shipments"
 
     ShipmentID = Column(Integer, primary_key=True, autoincrement=True)
-    CourierID = Column(Integer, ForeignKey("couriers.CourierID"))
-    UserID = Column(String(36), ForeignKey("users.UserID"))
+    CourierID = Column(Integer, ForeignKey("couriers.CourierID"), index=True)
+    UserID = Column(String(36), ForeignKey("users.UserID"), index=True)
     ShipmentQuantity = Column(Integer)
     ShipmentDate = Column(DateTime, nullable=True)
     Check_in_Date = Column(DateTime, nullable=True)
@@ -104,8 +123,45 @@ class Shipment(Base):
     Rescalled_Weight = Column(Float, nullable=True)
     Rescalled_Date = Column(DateTime, nullable=True)
     Centra_Reception_File = Column(Boolean,nullable=True)
+    CheckInToken = Column(String(64), unique=True, index=True, nullable=True)
     
     flours = relationship("Flour", secondary=shipment_flour_association, backref="shipments")
+
+    __table_args__ = (
+        # Shipments sent but not yet checked in at the harbor
+        Index("ix_shipments_awaiting_check_in", "ShipmentID", postgresql_where=text("\"ShipmentDate\" IS NOT NULL AND \"Check_in_Date\" IS NULL")),
+        Index("ix_shipments_ShipmentDate_ShipmentID", "ShipmentDate", "ShipmentID"),
+    )
+
+class ProductionTotals(Base):
+    __tablename__ = "production_totals"
+
+    # Centra UserID, or "global" for the row summing every centra
+    UserID = Column(String(36), primary_key=True)
+    WetLeavesWeight = Column(Float, nullable=False, default=0)
+    DryLeavesWeight = Column(Float, nullable=False, default=0)
+    FlourWeight = Column(Float, nullable=False, default=0)
+    ShipmentQuantity = Column(Integer, nullable=False, default=0)
+
+class ReferenceDataVersion(Base):
+    __tablename__ = "reference_data_version"
+
+    # One row (id 1); see reference.py
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+class ProductionDaily(Base):
+    __tablename__ = "production_daily"
+
+    UserID = Column(String(36), primary_key=True)
+    Day = Column(Date, primary_key=True)
+    # "wet_leaves", "dry_leaves", "flour" or "shipment"
+    Stage = Column(String(20), primary_key=True)
+    Total = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_production_daily_Day_Stage", "Day", "Stage"),
+    )
    
    
 #marketplace 
@@ -156,8 +212,8 @@ class MarketShipment(Base):
     __tablename__ = "market_shipment"
     
     MarketShipmentID = Column(Integer, primary_key=True, autoincrement=True)
-    CentraID = Column(String(36), ForeignKey('users.UserID'))  
-    CustomerID = Column(String(36), ForeignKey('users.UserID'))  
+    CentraID = Column(String(36), ForeignKey('users.UserID'), index=True)
+    CustomerID = Column(String(36), ForeignKey('users.UserID'), index=True)
     DryLeavesID = Column(Integer, ForeignKey('dry_leaves.DryLeavesID'))
     PowderID = Column(Integer, ForeignKey('flour.FlourID'))
     status = Column(String)
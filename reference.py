@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+from database import SessionLocal
+import models
+import schemas
+
+load_dotenv()
+
+
+class ReferenceDataCache:
+    """In-memory copy of roles, couriers, products, discount conditions and admin settings.
+
+    Writes bump the reference_data_version row. A worker compares the version it loaded
+    against that row at most every `check_interval` seconds and reloads every table when it
+    moved, so a change made through one worker reaches the others within that interval.
+    """
+
+    def __init__(self, session_factory, check_interval: float):
+        self.session_factory = session_factory
+        self.check_interval = check_interval
+        self.loads = 0
+        self.checks = 0
+        self._data = None
+        self._version = None
+        self._checked_at = 0.0
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _snapshot(self):
+        with self._lock:
+            if self._data is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._data
+            with self.session_factory() as db:
+                version = db.query(models.ReferenceDataVersion.version).filter(models.ReferenceDataVersion.id == 1).scalar() or 0
+                self.checks += 1
+                if self._data is None or version != self._version:
+                    self._data = self._load(db)
+                    self._version = version
+                    self._loaded_at = datetime.now()
+                    self.loads += 1
+            self._checked_at = time.monotonic()
+            return self._data
+
+    @staticmethod
+    def _load(db):
+        roles = [schemas.Role.model_validate(row, from_attributes=True) for row in db.query(models.RoleModel).order_by(models.RoleModel.RoleID)]
+        couriers = [schemas.Courier.model_validate(row, from_attributes=True) for row in db.query(models.Courier).order_by(models.Courier.CourierID)]
+        products = [schemas.Products.model_validate(row, from_attributes=True) for row in db.query(models.Products).order_by(models.Products.ProductID)]
+        discount_conditions = [
+            schemas.DiscountCondition.model_validate(row, from_attributes=True)
+            for row in db.query(models.DiscountCondition).order_by(models.DiscountCondition.DiscountConditionID)
+        ]
+        admin_settings = db.query(models.AdminSettings).order_by(models.AdminSettings.AdminSettingsID).first()
+        return {
+            "roles": roles,
+            "roles_by_id": {role.RoleID: role for role in roles},
+            "role_ids_by_name": {role.RoleName: role.RoleID for role in roles},
+            "couriers": couriers,
+            "couriers_by_id": {courier.CourierID: courier for courier in couriers},
+            "products": products,
+            "products_by_id": {product.ProductID: product for product in products},
+            "discount_conditions": discount_conditions,
+            "admin_settings": schemas.AdminSettings.model_validate(admin_settings, from_attributes=True) if admin_settings else None,
+        }
+
+    def roles(self):
+        return list(self._snapshot()["roles"])
+
+    def role(self, role_id: int):
+        return self._snapshot()["roles_by_id"].get(role_id)
+
+    def role_id_by_name(self, role_name: str):
+        return self._snapshot()["role_ids_by_name"].get(role_name)
+
+    def couriers(self):
+        return list(self._snapshot()["couriers"])
+
+    def courier(self, courier_id: int):
+        return self._snapshot()["couriers_by_id"].get(courier_id)
+
+    def products(self):
+        return list(self._snapshot()["products"])
+
+    def product(self, product_id: int):
+        return self._snapshot()["products_by_id"].get(product_id)
+
+    def discount_conditions(self):
+        return list(self._snapshot()["discount_conditions"])
+
+    def admin_settings(self):
+        return self._snapshot()["admin_settings"]
+
+    def invalidate(self):
+        # Forces a version check on the next lookup; the writer bumped the version, so that reloads
+        with self._lock:
+            self._checked_at = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self._version,
+                "loaded_at": self._loaded_at,
+                "loads": self.loads,
+                "checks": self.checks,
+                "check_interval": self.check_interval,
+            }
+
+
+# Seconds a worker may serve its copy before checking whether another worker changed the tables
+reference_data = ReferenceDataCache(
+    SessionLocal,
+    check_interval=float(os.getenv("REFERENCE_CACHE_CHECK_INTERVAL", "5")),
+)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, UUID4
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Dict
+from datetime import datetime, date
 
 
 class GenerateOTPRequest(BaseModel):
@@ -18,6 +18,7 @@ class SessionData(BaseModel):
     user_id: str
     user_role: int
     user_email: str
+    expires_at: Optional[datetime] = None
 
 class OTPBase(BaseModel):
     email: str
@@ -108,6 +109,7 @@ class DryLeavesBase(BaseModel):
     UserID: UUID4
     WetLeavesID: int
     Processed_Weight: Optional[float]
+    ProcessedTime: Optional[datetime] = None
     Expiration: Optional[datetime]
     Status: Optional[str] = "Awaiting"
 
@@ -127,6 +129,10 @@ class DryLeavesUpdate(BaseModel):
 class DryLeavesStatusUpdate(BaseModel):
     Status: str
 
+class DryLeavesBulkStatusResult(BaseModel):
+    updated: List[DryLeaves]
+    missing: List[int]
+
 class WetLeavesBase(BaseModel):
     UserID: UUID4
     Weight: float
@@ -150,6 +156,30 @@ class WetLeavesUpdate(BaseModel):
 class WetLeavesStatusUpdate(BaseModel):
     Status: str
 
+class WetLeavesBulkStatusResult(BaseModel):
+    updated: List[WetLeaves]
+    missing: List[int]
+
+class BulkStatusUpdate(BaseModel):
+    ids: List[int]
+    Status: str
+
+class BulkRowError(BaseModel):
+    row: int
+    detail: str
+
+class BulkIngestResult(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[BulkRowError]
+
+class ProductionTimeseriesPoint(BaseModel):
+    period: date
+    wet_leaves: float
+    dry_leaves: float
+    flour: float
+    shipment: float
+
 class SimpleFlour(BaseModel):
     id: int
     weight: float
@@ -158,6 +188,7 @@ class FlourBase(BaseModel):
     UserID: UUID4
     DryLeavesID: int
     Flour_Weight: float
+    ProcessedTime: Optional[datetime] = None
     Expiration: Optional[datetime]
     Status: Optional[str] = "Awaiting"
 
@@ -177,6 +208,10 @@ class FlourUpdate(BaseModel):
 class FlourStatusUpdate(BaseModel):
     Status: str
 
+class FlourBulkStatusResult(BaseModel):
+    updated: List[Flour]
+    missing: List[int]
+
 class ShipmentBase(BaseModel):
     CourierID: int
     UserID: UUID4
@@ -205,6 +240,28 @@ class ShipmentUpdate(BaseModel):
 class Shipment(ShipmentBase):
     ShipmentID: int
 
+# Returned once, to the centra creating the shipment; no endpoint reads the token back
+class ShipmentCreated(Shipment):
+    CheckInToken: str
+
+class DryLeavesLineage(DryLeaves):
+    Source: Optional[WetLeaves] = None
+
+class FlourLineage(Flour):
+    Source: Optional[DryLeavesLineage] = None
+
+class ShipmentLineage(Shipment):
+    Flours: List[FlourLineage]
+
+class CentraDashboard(BaseModel):
+    user_id: str
+    wet_leaves: List[WetLeaves]
+    dry_leaves: List[DryLeaves]
+    flour: List[Flour]
+    shipments: List[Shipment]
+    statistics: Dict[str, str]
+    total_weight_today: float
+
 class ShipmentDateUpdate(BaseModel):
     ShipmentDate: Optional[datetime] = None
 
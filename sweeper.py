@@ -0,0 +1,101 @@
+import os
+import threading
+from datetime import datetime
+from dotenv import load_dotenv
+import crud
+from database import SessionLocal
+
+load_dotenv()
+
+
+class ExpirationSweeper:
+    """Background thread that runs `sweep(db, batch_size=...)` every `interval` seconds.
+
+    `sweep` returns a dict of counts, which are kept for the last run and summed over all runs.
+    """
+
+    def __init__(self, name: str, session_factory, sweep, interval: float, batch_size: int):
+        self.name = name
+        self.session_factory = session_factory
+        self.sweep = sweep
+        self.interval = interval
+        self.batch_size = batch_size
+        self.runs = 0
+        self.failures = 0
+        self.last_run = None
+        self.last_counts = {}
+        self.total_counts = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def run_once(self):
+        db = self.session_factory()
+        try:
+            counts = self.sweep(db, batch_size=self.batch_size)
+        finally:
+            db.close()
+        with self._lock:
+            self.runs += 1
+            self.last_run = datetime.now()
+            self.last_counts = counts
+            for stage, count in counts.items():
+                self.total_counts[stage] = self.total_counts.get(stage, 0) + count
+        if any(counts.values()):
+            print(f"{self.name}: {counts}")
+        return counts
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                # Keep sweeping on the next tick; a failed batch has been rolled back
+                with self._lock:
+                    self.failures += 1
+                print(f"{self.name} failed: {e}")
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._thread is not None,
+                "interval": self.interval,
+                "batch_size": self.batch_size,
+                "runs": self.runs,
+                "failures": self.failures,
+                "last_run": self.last_run,
+                "last_counts": dict(self.last_counts),
+                "total_counts": dict(self.total_counts),
+            }
+
+
+# Seconds between sweeps; 0 turns the background sweep off
+expiration_sweeper = ExpirationSweeper(
+    "expiration-sweeper",
+    SessionLocal,
+    crud.expire_stock,
+    interval=float(os.getenv("EXPIRATION_SWEEP_INTERVAL", "300")),
+    batch_size=int(os.getenv("EXPIRATION_SWEEP_BATCH_SIZE", "1000")),
+)
+
+session_sweeper = ExpirationSweeper(
+    "session-sweeper",
+    SessionLocal,
+    crud.delete_expired_sessions,
+    interval=float(os.getenv("SESSION_SWEEP_INTERVAL", "3600")),
+    batch_size=int(os.getenv("SESSION_SWEEP_BATCH_SIZE", "1000")),
+)